@@ -0,0 +1,88 @@
+"""
+Latency and throughput of the embedding backends.
+
+For each backend this measures single-query latency (p50/p95, what a search
+pays) and batched throughput (what ingestion pays). Backends that cannot be
+created here (no Ollama server, fastembed not installed) are skipped.
+
+Usage:
+    uv run python benchmarks/bench_embeddings.py \
+        --backend ollama=qwen3-embedding:4b \
+        --backend local=sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2
+"""
+
+import argparse
+import asyncio
+from statistics import quantiles
+from time import perf_counter
+
+from assistant.api.config import settings
+from assistant.search.embeddings import create_embeddings
+
+QUERIES = [
+    "nepromokavé pánské trekové boty",
+    "dámská zimní bunda s kapucí",
+    "dětské lyžařské brýle",
+    "lehké běžecké tričko",
+    "rukavice na skialpy",
+    "batoh 30 l na jednodenní túry",
+    "sluneční brýle s polarizací",
+    "teplé merino ponožky",
+]
+
+
+def make_backend(spec: str):
+    backend, _, model = spec.partition("=")
+    settings.embedding_backend = backend
+    settings.embedding_model = model or settings.embedding_model
+    return create_embeddings()
+
+
+async def bench(embeddings, queries: int, docs: int, batch: int) -> dict:
+    texts = [f"{QUERIES[i % len(QUERIES)]} {i}" for i in range(max(queries, docs))]
+    await embeddings.aembed_documents(texts[:2])  # warm up (model load, connection)
+
+    latencies = []
+    for text in texts[:queries]:
+        start = perf_counter()
+        await embeddings.aembed_documents([text])
+        latencies.append((perf_counter() - start) * 1000)
+
+    start = perf_counter()
+    await asyncio.gather(
+        *(
+            embeddings.aembed_documents(texts[i : i + batch])
+            for i in range(0, docs, batch)
+        )
+    )
+    elapsed = perf_counter() - start
+    cuts = quantiles(latencies, n=20)
+    return {"p50": cuts[9], "p95": cuts[18], "docs_per_s": docs / elapsed}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--backend",
+        action="append",
+        help="backend=model, e.g. local=BAAI/bge-small-en-v1.5 (repeatable)",
+    )
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--docs", type=int, default=512)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+    specs = args.backend or [f"{settings.embedding_backend}={settings.embedding_model}"]
+
+    print(f"{'backend':<70}{'p50 ms':>10}{'p95 ms':>10}{'docs/s':>10}")
+    for spec in specs:
+        try:
+            embeddings = make_backend(spec)
+            r = await bench(embeddings, args.queries, args.docs, args.batch)
+        except Exception as exc:
+            print(f"{spec:<70} skipped: {exc!r}"[:160])
+            continue
+        print(f"{spec:<70}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['docs_per_s']:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""
+Import time of the API app, i.e. what every new worker pays before serving.
+
+Each run imports ``assistant.api.main`` in a fresh interpreter (so nothing is
+shared between runs) with Langfuse, Qdrant and Ollama pointed at a closed
+port: importing the app must not need the network. Reports the wall time of
+the import (p50 and max over runs) and the slowest modules from
+``python -X importtime`` of the last run.
+
+Usage:
+    uv run python benchmarks/bench_import.py --runs 10 --top 15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from statistics import median
+
+MODULE = "assistant.api.main"
+
+SCRIPT = f"""
+from time import perf_counter
+start = perf_counter()
+import {MODULE}
+print(perf_counter() - start)
+"""
+
+OFFLINE = {
+    "LANGFUSE_HOST": "http://127.0.0.1:9",
+    "QDRANT_HOST": "127.0.0.1",
+    "QDRANT_PORT": "9",
+    "QDRANT_GRPC_PORT": "9",
+    "OLLAMA_HOST": "http://127.0.0.1:9",
+}
+
+
+def import_once(env: dict[str, str]) -> tuple[float, str]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest(importtime: str, top: int) -> list[tuple[int, str]]:
+    """Modules by cumulative import time (microseconds)."""
+    rows = []
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    env = {**os.environ, **OFFLINE}
+    times = []
+    for _ in range(args.runs):
+        elapsed, importtime = import_once(env)
+        times.append(elapsed)
+
+    print(f"import {MODULE}: p50 {median(times):.2f}s  max {max(times):.2f}s")
+    print("slowest modules (cumulative):")
+    for cumulative, name in slowest(importtime, args.top):
+        print(f"  {cumulative / 1e6:6.2f}s  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Recall@k and latency of the retrieval profiles against the live collection.
+
+The query set is JSONL, one query per line::
+
+    {"name": "...", "description": "...", "groups": [], "genders": [],
+     "min_price": null, "max_price": null, "relevant": ["slug-1", "slug-2"]}
+
+``relevant`` lists the expected slugs. Lines without it are scored against an
+exact (brute-force, full precision) search with ``--k`` results, which measures
+what the HNSW and quantization shortcuts lose.
+
+Query embeddings are computed once up front (and cached), so latencies cover
+the Qdrant query only.
+
+Usage:
+    uv run python benchmarks/bench_retrieval.py queries.jsonl --k 10 --repeat 3
+"""
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+from statistics import mean, quantiles
+from time import perf_counter
+
+from assistant.search.profiles import PROFILES, RetrievalProfile
+from assistant.search.qdrant import product_filter, query_embeddings, search_products
+
+EXACT = RetrievalProfile("exact", prefetch_limit=100, exact=True)
+
+
+def load_queries(path: Path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def query_filter(q: dict):
+    return product_filter(
+        q.get("groups", []),
+        q.get("genders", []),
+        q.get("min_price"),
+        q.get("max_price"),
+    )
+
+
+async def search(q: dict, profile: RetrievalProfile, k: int) -> list[str]:
+    points = await search_products(
+        q["name"], q["description"], query_filter(q), profile, k, ["slug"]
+    )
+    return [p.payload["slug"] for p in points]
+
+
+def recall(found: list[str], relevant: list[str], k: int) -> float:
+    if not relevant:
+        return 1.0
+    return len(set(found[:k]) & set(relevant)) / min(len(relevant), k)
+
+
+async def bench(queries, profile: RetrievalProfile, k: int, repeat: int) -> dict:
+    latencies, recalls = [], []
+    for q in queries:
+        for _ in range(repeat):
+            start = perf_counter()
+            found = await search(q, profile, k)
+            latencies.append((perf_counter() - start) * 1000)
+        recalls.append(recall(found, q["relevant"], k))
+    p50, p95 = quantiles(latencies, n=20)[9], quantiles(latencies, n=20)[18]
+    return {"recall": mean(recalls), "p50": p50, "p95": p95}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("queries", type=Path)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES)
+    )
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    await query_embeddings().aembed_queries(
+        [text for q in queries for text in (q["name"], q["description"])]
+    )
+    for q in queries:
+        if "relevant" not in q:
+            q["relevant"] = await search(q, EXACT, args.k)
+
+    print(f"{len(queries)} queries, k={args.k}, {args.repeat} runs each")
+    print(f"{'profile':<12}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name in args.profiles:
+        r = await bench(queries, PROFILES[name], args.k, args.repeat)
+        print(f"{name:<12}{r['recall']:>10.3f}{r['p50']:>10.2f}{r['p95']:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+"""
+Microbenchmark: indexed MemoryStore vs. the previous scan-and-copy implementation.
+
+Usage:
+    uv run python benchmarks/bench_store.py --threads 100000 --items 5000
+"""
+
+import argparse
+import asyncio
+from datetime import UTC, datetime, timedelta
+from time import perf_counter
+
+from chatkit.store import NotFoundError
+from chatkit.types import (
+    InferenceOptions,
+    Page,
+    ThreadMetadata,
+    UserMessageItem,
+    UserMessageTextContent,
+)
+
+from assistant.ui.store import MemoryStore
+
+
+class BaselineMemoryStore(MemoryStore):
+    """The pre-index MemoryStore hot paths: sort, deep-copy and scan everything."""
+
+    async def load_threads(self, limit, after, order, context):
+        threads = sorted(
+            (s.thread.model_copy(deep=True) for s in self._threads.values()),
+            key=lambda t: t.created_at or datetime.min,
+            reverse=(order == "desc"),
+        )
+        index_map = {t.id: idx for idx, t in enumerate(threads)} if after else {}
+        start = index_map.get(after, -1) + 1
+        page = threads[start : start + limit + 1]
+        has_more = len(page) > limit
+        page = page[:limit]
+        return Page(
+            data=page, has_more=has_more, after=page[-1].id if has_more else None
+        )
+
+    async def load_thread_items(self, thread_id, after, limit, order, context):
+        items = [i.model_copy(deep=True) for i in self._threads[thread_id].items]
+        if order == "desc":
+            items = list(reversed(items))
+        index_map = {i.id: idx for idx, i in enumerate(items)} if after else {}
+        start = index_map.get(after, -1) + 1
+        page = items[start : start + limit + 1]
+        has_more = len(page) > limit
+        page = page[:limit]
+        return Page(
+            data=page, has_more=has_more, after=page[-1].id if has_more else None
+        )
+
+    async def save_item(self, thread_id, item, context):
+        items = self._threads[thread_id].items
+        for idx, existing in enumerate(items):
+            if existing.id == item.id:
+                items[idx] = item.model_copy(deep=True)
+                return
+
+    async def load_item(self, thread_id, item_id, context):
+        for item in self._threads[thread_id].items:
+            if item.id == item_id:
+                return item.model_copy(deep=True)
+        raise NotFoundError(item_id)
+
+
+def make_item(thread_id: str, idx: int, created_at: datetime) -> UserMessageItem:
+    return UserMessageItem(
+        id=f"{thread_id}-msg-{idx}",
+        thread_id=thread_id,
+        created_at=created_at,
+        content=[UserMessageTextContent(text=f"message {idx} " * 8)],
+        inference_options=InferenceOptions(),
+    )
+
+
+async def fill(store: MemoryStore, n_threads: int, n_items: int) -> None:
+    base = datetime(2025, 1, 1, tzinfo=UTC)
+    for t in range(n_threads):
+        await store.save_thread(
+            ThreadMetadata(id=f"thr-{t}", created_at=base + timedelta(seconds=t)), {}
+        )
+    for i in range(n_items):
+        await store.add_thread_item(
+            "thr-0", make_item("thr-0", i, base + timedelta(seconds=i)), {}
+        )
+
+
+async def timeit(fn, repeat: int) -> float:
+    start = perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (perf_counter() - start) / repeat * 1000
+
+
+async def bench(store: MemoryStore, n_threads: int, n_items: int, repeat: int):
+    mid_thread = f"thr-{n_threads // 2}"
+    mid_item = f"thr-0-msg-{n_items // 2}"
+    last = make_item("thr-0", n_items - 1, datetime.now(UTC))
+    return {
+        "load_threads first page": await timeit(
+            lambda: store.load_threads(20, None, "desc", {}), repeat
+        ),
+        "load_threads cursor page": await timeit(
+            lambda: store.load_threads(20, mid_thread, "desc", {}), repeat
+        ),
+        "load_thread_items tail": await timeit(
+            lambda: store.load_thread_items("thr-0", None, 20, "desc", {}), repeat
+        ),
+        "load_thread_items cursor": await timeit(
+            lambda: store.load_thread_items("thr-0", mid_item, 20, "asc", {}), repeat
+        ),
+        "save_item (last)": await timeit(
+            lambda: store.save_item("thr-0", last, {}), repeat
+        ),
+        "load_item (middle)": await timeit(
+            lambda: store.load_item("thr-0", mid_item, {}), repeat
+        ),
+    }
+
+
+async def check_equivalent(new: MemoryStore, old: MemoryStore) -> None:
+    for order in ("asc", "desc"):
+        for after in (None, "thr-3", "thr-0-msg-7"):
+            a = await new.load_thread_items("thr-0", after, 5, order, {})
+            b = await old.load_thread_items("thr-0", after, 5, order, {})
+            assert [i.id for i in a.data] == [i.id for i in b.data], (order, after)
+            assert (a.has_more, a.after) == (b.has_more, b.after)
+        for after in (None, "thr-3"):
+            a = await new.load_threads(5, after, order, {})
+            b = await old.load_threads(5, after, order, {})
+            assert [t.id for t in a.data] == [t.id for t in b.data], (order, after)
+            assert (a.has_more, a.after) == (b.has_more, b.after)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    stores = {"baseline": BaselineMemoryStore(), "indexed": MemoryStore()}
+    for name, store in stores.items():
+        await fill(store, args.threads, args.items)
+        results[name] = await bench(store, args.threads, args.items, args.repeat)
+    await check_equivalent(stores["indexed"], stores["baseline"])
+
+    print(f"{args.threads} threads, {args.items} items in one thread (ms/op)")
+    print(f"{'operation':<28}{'baseline':>12}{'indexed':>12}{'speedup':>10}")
+    for op, old in results["baseline"].items():
+        new = results["indexed"][op]
+        print(f"{op:<28}{old:>12.3f}{new:>12.3f}{old / new:>9.0f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+"""
+Benchmarks for the streaming pipeline.
+
+- coalescing: events per response before/after delta coalescing on a simulated
+  LLM token stream, and the time-to-first-token added by the coalescing stage.
+- accumulate: building long (10k+ token) responses with per-token string
+  concatenation vs. TextAccumulator, for str and content-block chunks.
+
+Usage:
+    uv run python benchmarks/bench_streaming.py --tokens 800 --gap-ms 5
+    uv run python benchmarks/bench_streaming.py --long-tokens 50000
+"""
+
+import argparse
+import asyncio
+import random
+from time import perf_counter
+
+from assistant.utils.streaming import CoalesceStats, TextAccumulator, coalesce_deltas
+
+
+async def token_stream(n_tokens: int, gap_ms: float, jitter: float):
+    yield ("custom", "Searching for products...")
+    for i in range(n_tokens):
+        await asyncio.sleep(max(random.gauss(gap_ms, gap_ms * jitter), 0) / 1000)
+        yield ("messages", f"tok{i} ")
+
+
+async def run(args, window_ms: float, max_chars: int) -> dict[str, float]:
+    stats = CoalesceStats()
+    for _ in range(args.responses):
+        text = []
+        async for mode, delta in coalesce_deltas(
+            token_stream(args.tokens, args.gap_ms, args.jitter),
+            window_ms=window_ms,
+            max_chars=max_chars,
+            stats=stats,
+        ):
+            if mode == "messages":
+                text.append(delta)
+        assert "".join(text) == "".join(f"tok{i} " for i in range(args.tokens))
+    return stats.snapshot()
+
+
+def concat_baseline(chunks: list) -> str:
+    """Previous behaviour: ``out += ...`` per block, ``response += part`` per token."""
+    response = ""
+    for chunk in chunks:
+        part = ""
+        if isinstance(chunk, str):
+            part = chunk
+        else:
+            for b in chunk:
+                if isinstance(b, dict):
+                    part += b.get("text", "")
+        response += part
+    return response
+
+
+def concat_aliased(chunks: list) -> str:
+    """``+=`` when the partial string is referenced elsewhere (tracing, PyPy...).
+
+    CPython only resizes a string in place when nothing else refers to it;
+    otherwise every ``+=`` copies the whole response.
+    """
+    response = ""
+    seen = response
+    for chunk in chunks:
+        response += chunk if isinstance(chunk, str) else chunk[0]["text"]
+        seen = response  # noqa: F841
+    return response
+
+
+def accumulate(chunks: list) -> str:
+    acc = TextAccumulator()
+    for chunk in chunks:
+        acc.append(chunk)
+    return acc.getvalue()
+
+
+def bench_accumulate(n_tokens: int, repeat: int) -> None:
+    words = [f"slovo{i % 97} " for i in range(n_tokens)]
+    blocks = [[{"type": "text", "text": w, "index": 0}] for w in words]
+    fns = (concat_baseline, concat_aliased, accumulate)
+    print(f"\naccumulating {n_tokens} tokens (ms per response)")
+    print(f"{'chunks':<16}" + "".join(f"{fn.__name__:>18}" for fn in fns))
+    for label, chunks in (("str", words), ("content blocks", blocks)):
+        expected = "".join(words)
+        row = f"{label:<16}"
+        for fn in fns:
+            assert fn(chunks) == expected
+            start = perf_counter()
+            for _ in range(repeat):
+                fn(chunks)
+            row += f"{(perf_counter() - start) / repeat * 1000:>18.2f}"
+        print(row)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=800)
+    parser.add_argument("--gap-ms", type=float, default=5.0)
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--responses", type=int, default=3)
+    parser.add_argument("--long-tokens", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{args.tokens} tokens/response, ~{args.gap_ms} ms between tokens")
+    print(
+        f"{'window_ms':>10}{'max_chars':>10}{'events/resp':>13}"
+        f"{'reduction':>11}{'+ttft_ms':>10}{'max_delay_ms':>14}"
+    )
+    for window_ms, max_chars in [(0, 0), (20, 512), (30, 512), (50, 512), (50, 64)]:
+        snap = await run(args, window_ms, max_chars)
+        if window_ms == 0:
+            # Passthrough does not touch the stats; count the raw deltas instead.
+            snap = {**snap, "events_per_response": args.tokens, "reduction": 1.0}
+        print(
+            f"{window_ms:>10}{max_chars:>10}{snap['events_per_response']:>13.1f}"
+            f"{snap['reduction']:>10.1f}x{snap['added_ttft_ms']:>10.2f}"
+            f"{snap['added_latency_max_ms']:>14.1f}"
+        )
+
+    bench_accumulate(args.long_tokens, args.repeat)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
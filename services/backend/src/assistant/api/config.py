@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from dotenv import load_dotenv
 from pydantic import SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -13,6 +15,9 @@ class Settings(BaseSettings):
     langfuse_public_key: str
     langfuse_secret_key: SecretStr
     langfuse_host: str
+    # local copy of Langfuse prompts, refreshed in the background
+    prompt_cache_dir: str = "data/prompts"
+    prompt_refresh_interval: float = 300.0
     # openai
     openai_api_key: SecretStr
     model_name: str
@@ -22,6 +27,63 @@ class Settings(BaseSettings):
     qdrant_host: str
     qdrant_port: int
     qdrant_grpc_port: int
+    # collection storage (applied by fill_db) and default search profile
+    qdrant_quantization: Literal["none", "scalar", "binary"] = "scalar"
+    qdrant_vectors_on_disk: bool = False
+    qdrant_hnsw_m: int = 16
+    qdrant_hnsw_ef_construct: int = 100
+    retrieval_profile: Literal["fast", "balanced", "accurate"] = "balanced"
+    # lexical fast path: minimum BM25 score and lead over the second hit
+    lexical_fast_path_score: float = 8.0
+    lexical_fast_path_margin: float = 2.0
+    # embeddings; "local" runs a fastembed ONNX model in-process, e.g.
+    # EMBEDDING_MODEL=sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2
+    embedding_backend: Literal["ollama", "local"] = "ollama"
+    embedding_model: str = "qwen3-embedding:4b"
+    embedding_workers: int = 4
+    embedding_batch_size: int = 32
+    embedding_cache_dir: Optional[str] = None
+    embedding_cache_size: int = 2048
+    embedding_cache_ttl: float = 3600.0
+    product_cache_size: int = 5000
+    product_cache_ttl: float = 600.0
+    product_code_map_path: str = "data/product_codes.json"
+    # LLM HTTP connection pool (shared by OpenAI models)
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 60.0
+    llm_connect_timeout: float = 10.0
+    llm_read_timeout: float = 120.0
+    # memoized tool results (db_agent); 0 keeps them for the current run only
+    tool_memo_thread_size: int = 2000
+    tool_memo_thread_ttl: float = 300.0
+    # concurrent tool calls per thread (0 = unlimited)
+    tool_max_concurrency: int = 4
+    # evaluation jobs
+    eval_concurrency: int = 4
+    eval_jobs_keep: int = 50
+    # checkpointer
+    checkpointer_backend: Literal["memory", "sqlite"] = "memory"
+    checkpointer_dir: str = "data/checkpoints"
+    checkpointer_max_threads: int = 1000
+    checkpointer_keep_per_thread: int = 20
+    # semantic cache of first-turn answers (ChatKit endpoint)
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_size: int = 1000
+    semantic_cache_ttl: float = 3600.0
+    catalog_version_path: str = "data/catalog.version"
+    # chatkit store
+    chatkit_store: Literal["memory", "sqlite"] = "memory"
+    chatkit_store_path: str = "data/chatkit.sqlite"
+    chatkit_attachments_dir: str = "data/attachments"
+    # public base URL of the /ui/attachments endpoints (sqlite store only)
+    chatkit_attachments_url: str = "http://localhost:8000/ui/attachments"
+    # item write buffering (sqlite); 0 writes through
+    chatkit_store_flush_interval: float = 0.05
+    # streaming
+    stream_coalesce_ms: float = 30.0
+    stream_coalesce_chars: int = 512
 
 
 settings = Settings()  # type: ignore
@@ -1,9 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from assistant.api.routers import chat, eval, ui
+from assistant.graphs.db_agent import system_prompt, tool_memo
+from assistant.graphs.models import aclose_http_client
+from assistant.search.qdrant import (
+    aclose_qdrant_client,
+    product_cache,
+    query_embeddings,
+)
+from assistant.utils.metrics import registry
+from assistant.utils.streaming import coalesce_stats
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    prompt_refresh = await system_prompt.start()
+    yield
+    prompt_refresh.cancel()
+    with suppress(asyncio.CancelledError):
+        await prompt_refresh
+    await ui.aclose_server()
+    await aclose_http_client()
+    await aclose_qdrant_client()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +44,47 @@ app.include_router(ui.router)
 app.include_router(eval.router)
 
 
+def embedding_cache_stats():
+    if query_embeddings.cache_info().currsize:
+        return query_embeddings().stats()
+
+
+def semantic_cache_stats():
+    if ui.get_server.cache_info().currsize:
+        semantic_cache = ui.get_server().semantic_cache
+        if semantic_cache is not None:
+            return semantic_cache.stats()
+
+
+registry.add_gauges(
+    "assistant_stream_coalesce", "Stream delta coalescing.", coalesce_stats.snapshot
+)
+registry.add_gauges(
+    "assistant_product_cache_by_code",
+    "Product cache (by variant code).",
+    product_cache.by_code.stats,
+)
+registry.add_gauges(
+    "assistant_product_cache_by_slug",
+    "Product cache (by slug).",
+    product_cache.by_slug.stats,
+)
+registry.add_gauges(
+    "assistant_embedding_cache", "Query embedding cache.", embedding_cache_stats
+)
+registry.add_gauges(
+    "assistant_tool_memo", "Deduplicated agent tool calls.", tool_memo.stats
+)
+registry.add_gauges(
+    "assistant_semantic_cache", "Semantic answer cache.", semantic_cache_stats
+)
+
+
 @app.get("/")
 async def root():
     return {"message": "Hello From Root!"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return registry.render()
@@ -1,15 +1,20 @@
-from fastapi import APIRouter
-from fastapi.responses import StreamingResponse
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import APIRouter, Request
+from langfuse.langchain import CallbackHandler
 from pydantic import BaseModel
 
-from assistant.graphs.chat import create_graph
-from assistant.graphs.db_agent import create_db_agent
-from assistant.utils.streaming import stream_graph_updates
+from assistant.graphs.registry import get_graph
+from assistant.search.profiles import profile_t
+from assistant.utils.sse import sse_response
+from assistant.utils.streaming import create_config, graph_events
 
 
 class ClientMessage(BaseModel):
     thread_id: str
     content: str
+    retrieval_profile: Optional[profile_t] = None
 
 
 router = APIRouter(
@@ -18,22 +23,32 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-graph = create_graph()
 
-agent_graph = create_db_agent()
+@lru_cache(maxsize=None)
+def langfuse_handler() -> CallbackHandler:
+    return CallbackHandler()
+
+
+def message_config(message: ClientMessage):
+    return create_config(
+        message.thread_id, langfuse_handler(), message.retrieval_profile
+    )
 
 
 @router.post("/chatbot")
-async def chatbot(message: ClientMessage):
-    return StreamingResponse(
-        stream_graph_updates(message.content, graph, message.thread_id),
-        media_type="text/event-stream",
+async def chatbot(message: ClientMessage, request: Request):
+    events = graph_events(
+        message.content,
+        get_graph("chat"),
+        message_config(message),
+        node_name="chatbot",
     )
+    return sse_response(events, request)
 
 
 @router.post("/agent")
-async def agent(message: ClientMessage):
-    return StreamingResponse(
-        stream_graph_updates(message.content, agent_graph, message.thread_id),
-        media_type="text/event-stream",
+async def agent(message: ClientMessage, request: Request):
+    events = graph_events(
+        message.content, get_graph("db_agent"), message_config(message)
     )
+    return sse_response(events, request)
@@ -1,6 +1,11 @@
-from fastapi import APIRouter
+from typing import Optional
 
-from assistant.utils.langfuse_test import run_experiment
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from assistant.utils.eval_jobs import EvalJob
+from assistant.utils.langfuse_test import eval_jobs
+from assistant.utils.sse import format_sse
 
 router = APIRouter(
     prefix="/eval",
@@ -8,8 +13,52 @@ router = APIRouter(
 )
 
 
+def get_job(job_id: str) -> EvalJob:
+    job = eval_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @router.post(
     "/run_experiment",
+    status_code=202,
 )
-async def run(experiment_name: str, dataset_name: str):
-    return run_experiment(experiment_name, dataset_name)
+async def run(
+    experiment_name: str,
+    dataset_name: str,
+    concurrency: Optional[int] = Query(None, ge=1),
+):
+    job = eval_jobs.submit(experiment_name, dataset_name, concurrency)
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/jobs")
+async def jobs():
+    return [job.summary() for job in eval_jobs.jobs()]
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return get_job(job_id).summary()
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = get_job(job_id)
+
+    async def stream():
+        async for event, data in job.follow():
+            yield format_sse(event, data)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    get_job(job_id)
+    return {"cancelled": eval_jobs.cancel(job_id)}
@@ -1,8 +1,17 @@
+import asyncio
+import mmap
+from functools import lru_cache
+from typing import Annotated, Iterator, Optional
+
 from chatkit.server import StreamingResult
-from fastapi import APIRouter, Request
+from chatkit.store import NotFoundError
+from fastapi import APIRouter, Header, HTTPException, Request, UploadFile
 from fastapi.responses import Response, StreamingResponse
 
+from assistant.api.config import settings
+from assistant.search.profiles import profile_t
 from assistant.ui.server import LangGraphChatKitServer
+from assistant.ui.sqlite_store import SQLiteStore
 from assistant.ui.store import MemoryStore
 
 router = APIRouter(
@@ -11,15 +20,84 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-data_store = MemoryStore()
-server = LangGraphChatKitServer(data_store)
+
+@lru_cache(maxsize=None)
+def get_server() -> LangGraphChatKitServer:
+    if settings.chatkit_store == "sqlite":
+        data_store = SQLiteStore(
+            settings.chatkit_store_path,
+            attachments_dir=settings.chatkit_attachments_dir,
+            flush_interval=settings.chatkit_store_flush_interval,
+            attachments_url=settings.chatkit_attachments_url,
+        )
+        return LangGraphChatKitServer(data_store, attachment_store=data_store)
+    return LangGraphChatKitServer(MemoryStore())
+
+
+async def aclose_server() -> None:
+    """Commit buffered store writes and close the store, if the server was used."""
+    if not get_server.cache_info().currsize:
+        return
+    store = get_server().store
+    if isinstance(store, SQLiteStore):
+        await store.aclose()
 
 
 @router.post(
     "/chat",
 )
-async def chatkit_endpoint(request: Request):
-    result = await server.process(await request.body(), {})
+async def chatkit_endpoint(
+    request: Request,
+    retrieval_profile: Annotated[Optional[profile_t], Header()] = None,
+):
+    context = {"retrieval_profile": retrieval_profile}
+    result = await get_server().process(await request.body(), context)
     if isinstance(result, StreamingResult):
         return StreamingResponse(result, media_type="text/event-stream")
     return Response(content=result.json, media_type="application/json")
+
+
+@router.get("/semantic-cache")
+async def semantic_cache_stats():
+    semantic_cache = get_server().semantic_cache
+    if semantic_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **semantic_cache.stats()}
+
+
+def _attachment_store() -> SQLiteStore:
+    store = get_server().attachment_store
+    if not isinstance(store, SQLiteStore):
+        raise HTTPException(status_code=404, detail="Attachments are not enabled")
+    return store
+
+
+def _chunks(blob: mmap.mmap | bytes, size: int = 1 << 16) -> Iterator[bytes]:
+    try:
+        for start in range(0, len(blob), size):
+            yield blob[start : start + size]
+    finally:
+        if isinstance(blob, mmap.mmap):
+            blob.close()
+
+
+@router.post("/attachments/{attachment_id}")
+async def upload_attachment(attachment_id: str, file: UploadFile):
+    store = _attachment_store()
+    try:
+        await store.write_attachment_blob(attachment_id, await file.read(), {})
+    except (NotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return {"id": attachment_id}
+
+
+@router.get("/attachments/{attachment_id}")
+async def download_attachment(attachment_id: str):
+    store = _attachment_store()
+    try:
+        attachment = await store.load_attachment(attachment_id, {})
+        blob = await asyncio.to_thread(store.read_attachment_blob, attachment_id)
+    except (NotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    # Sent in chunks straight from the mapping, without reading the whole file.
+    return StreamingResponse(_chunks(blob), media_type=attachment.mime_type)
@@ -0,0 +1,137 @@
+"""
+Pre-forked API server.
+
+The parent process imports the app and compiles the graphs once, moves
+everything it built out of the garbage collector's reach (``gc.freeze``) and
+forks the workers, which then share those pages copy-on-write instead of each
+importing and compiling on its own. Everything holding sockets, threads or an
+event loop (Qdrant, Langfuse, checkpointer connections) is created lazily
+inside each worker.
+
+Workers only share state through the SQLite backends; with the in-memory
+checkpointer or ChatKit store every worker has its own threads. A worker that
+exits without being asked to is replaced by a new fork of the parent.
+
+Usage:
+    uv run python -m assistant.api.serve --workers 4 --port 8000
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+from assistant.api.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A worker dying sooner than this after its start is restarted after a pause,
+# so a worker that cannot start does not fork in a tight loop.
+MIN_WORKER_LIFETIME = 1.0
+
+
+def bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket) -> None:
+    gc.enable()
+    config = uvicorn.Config(app, lifespan="on", log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(app, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 1
+        try:
+            run_worker(app, sock)
+            code = 0
+        except BaseException:
+            logger.exception("Worker %d failed", os.getpid())
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-forked API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s [%(process)d] %(message)s"
+    )
+    if args.workers > 1 and "memory" in (
+        settings.checkpointer_backend,
+        settings.chatkit_store,
+    ):
+        logger.warning(
+            "In-memory checkpointer/store; threads are not shared between "
+            "workers (set CHECKPOINTER_BACKEND and CHATKIT_STORE to sqlite)"
+        )
+
+    # No collections while preloading, so the shared objects are not moved
+    # between generations (and their pages not dirtied) before the fork.
+    gc.disable()
+    from assistant.api.main import app
+    from assistant.graphs.registry import preload
+
+    preload()
+    gc.freeze()
+
+    sock = bind(args.host, args.port)
+    stopping = False
+    # pid -> start time
+    workers: dict[int, float] = {}
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(args.workers):
+        workers[spawn(app, sock)] = time.monotonic()
+    logger.info("Started %d workers on %s:%d", len(workers), args.host, args.port)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning(
+            "Worker %d exited with code %d; restarting it",
+            pid,
+            os.waitstatus_to_exitcode(status),
+        )
+        if time.monotonic() - started < MIN_WORKER_LIFETIME:
+            time.sleep(MIN_WORKER_LIFETIME)
+        if not stopping:
+            workers[spawn(app, sock)] = time.monotonic()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,23 @@
-from langchain.chat_models import init_chat_model
+from typing import Optional
+
 from langchain_core.runnables import RunnableConfig
-from langfuse.langchain import CallbackHandler
-from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, START, END, MessagesState
 from langgraph.graph.state import CompiledStateGraph
 
 from assistant.api.config import settings
+from assistant.graphs.models import get_chat_model
 
 compiled_state = CompiledStateGraph[MessagesState, None, MessagesState, MessagesState]
 
-langfuse_handler = CallbackHandler()
-
-def create_config(thread_id: str) -> RunnableConfig:
-    return RunnableConfig(
-        configurable={"thread_id": thread_id},
-        callbacks=[langfuse_handler],
-        metadata={
-            "langfuse_session_id": thread_id,
-        },
-    )
 
 async def chatbot(state: MessagesState, config: RunnableConfig):
-    llm = init_chat_model(settings.model_name, streaming=True)
+    llm = get_chat_model(settings.model_name, streaming=True)
     ai_msg = await llm.ainvoke(state["messages"], config=config)
     return {"messages": [ai_msg]}
 
 
-def create_graph() -> compiled_state:
-    checkpointer = InMemorySaver()
+def create_graph(checkpointer: Optional[BaseCheckpointSaver] = None) -> compiled_state:
     graph_builder = StateGraph(MessagesState)
 
     graph_builder.add_node("chatbot", chatbot)
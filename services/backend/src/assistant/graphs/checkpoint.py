@@ -0,0 +1,257 @@
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from assistant.api.config import settings
+
+
+def _schedule(callback, *args) -> None:
+    """Run ``callback`` after the current step, off the caller's critical path."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        callback(*args)
+        return
+    loop.call_soon(callback, *args)
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """In-memory checkpointer with LRU thread eviction and per-thread retention.
+
+    At most ``max_threads`` threads are kept (least recently written first out)
+    and each thread namespace keeps only its ``keep_per_thread`` newest
+    checkpoints. Old checkpoints, their pending writes and unreferenced channel
+    blobs are compacted after the write that created them.
+    """
+
+    def __init__(self, max_threads: int = 1000, keep_per_thread: int = 20) -> None:
+        super().__init__()
+        self.max_threads = max_threads
+        self.keep_per_thread = keep_per_thread
+        self._recent: OrderedDict[str, None] = OrderedDict()
+        self._dirty: set[tuple[str, str]] = set()
+        self._dirty_lock = threading.Lock()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+
+        self._recent[thread_id] = None
+        self._recent.move_to_end(thread_id)
+        while len(self._recent) > self.max_threads:
+            evicted, _ = self._recent.popitem(last=False)
+            self.delete_thread(evicted)
+
+        if len(self.storage[thread_id][checkpoint_ns]) > self.keep_per_thread:
+            with self._dirty_lock:
+                schedule = not self._dirty
+                self._dirty.add((thread_id, checkpoint_ns))
+            if schedule:
+                _schedule(self.compact)
+        return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        self._recent.pop(thread_id, None)
+
+    def compact(self) -> None:
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        for thread_id, checkpoint_ns in dirty:
+            if thread_id in self.storage:
+                self._compact_namespace(thread_id, checkpoint_ns)
+
+    def _compact_namespace(self, thread_id: str, checkpoint_ns: str) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.keep_per_thread:
+            return
+        # Checkpoint ids are monotonic (uuid6), so sorting orders them by age.
+        ordered = sorted(checkpoints)
+        stale = ordered[: -self.keep_per_thread]
+        for checkpoint_id in stale:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        referenced: set[tuple[str, Any]] = set()
+        for saved, _, _ in checkpoints.values():
+            versions = self.serde.loads_typed(saved)["channel_versions"]
+            referenced.update(versions.items())
+        for key in [
+            k
+            for k in self.blobs
+            if k[0] == thread_id
+            and k[1] == checkpoint_ns
+            and (k[2], k[3]) not in referenced
+        ]:
+            del self.blobs[key]
+
+
+class SqliteCheckpointSaver(SqliteSaver):
+    """File-backed checkpointer shared by every worker that opens the same file.
+
+    The synchronous ``SqliteSaver`` does the SQL work; the async interface runs
+    it in a worker thread so the event loop is never blocked on disk I/O.
+    Each thread namespace keeps only its ``keep_per_thread`` newest checkpoints;
+    older ones are deleted in the background after writes.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        keep_per_thread: int = 20,
+        compact_every: int = 50,
+    ) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        super().__init__(conn)
+        self.keep_per_thread = keep_per_thread
+        self.compact_every = compact_every
+        self._writes_since_compaction = 0
+        self._dirty: set[tuple[str, str]] = set()
+        # put() runs in worker threads (see the async methods below).
+        self._dirty_lock = threading.Lock()
+        self._compaction: Optional[asyncio.Task] = None
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS writes_checkpoint_idx "
+            "ON writes (thread_id, checkpoint_ns, checkpoint_id)"
+        )
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        result = super().put(config, checkpoint, metadata, new_versions)
+        key = (
+            str(config["configurable"]["thread_id"]),
+            config["configurable"].get("checkpoint_ns", ""),
+        )
+        with self._dirty_lock:
+            self._dirty.add(key)
+            self._writes_since_compaction += 1
+        return result
+
+    def compact(self) -> None:
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        with self.cursor() as cur:
+            for thread_id, checkpoint_ns in dirty:
+                cur.execute(
+                    "SELECT checkpoint_id FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                    (thread_id, checkpoint_ns, self.keep_per_thread - 1),
+                )
+                row = cur.fetchone()
+                if row is None:
+                    continue
+                params = (thread_id, checkpoint_ns, row[0])
+                cur.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? "
+                    "AND checkpoint_ns = ? AND checkpoint_id < ?",
+                    params,
+                )
+                cur.execute(
+                    "DELETE FROM writes WHERE thread_id = ? "
+                    "AND checkpoint_ns = ? AND checkpoint_id < ?",
+                    params,
+                )
+
+    async def _maybe_compact(self) -> None:
+        if self._compaction is not None and not self._compaction.done():
+            return
+        with self._dirty_lock:
+            if self._writes_since_compaction < self.compact_every:
+                return
+            self._writes_since_compaction = 0
+        self._compaction = asyncio.create_task(asyncio.to_thread(self.compact))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        result = await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+        await self._maybe_compact()
+        return result
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def create_checkpointer(name: str) -> BaseCheckpointSaver:
+    """Build the checkpointer backend selected by ``settings.checkpointer_backend``.
+
+    Args:
+        name: Graph name; SQLite checkpoints are stored in
+            ``<checkpointer_dir>/<name>.sqlite``.
+    """
+    if settings.checkpointer_backend == "sqlite":
+        return SqliteCheckpointSaver(
+            Path(settings.checkpointer_dir) / f"{name}.sqlite",
+            keep_per_thread=settings.checkpointer_keep_per_thread,
+        )
+    return BoundedMemorySaver(
+        max_threads=settings.checkpointer_max_threads,
+        keep_per_thread=settings.checkpointer_keep_per_thread,
+    )
@@ -1,18 +1,31 @@
+from pathlib import Path
 from typing import Any, Optional
 
 from langchain.agents import AgentState, create_agent
 from langchain.agents.middleware import (
+    AgentMiddleware,
     ClearToolUsesEdit,
     ContextEditingMiddleware,
+    ModelRequest,
     SummarizationMiddleware,
     ToolCallLimitMiddleware,
+    dynamic_prompt,
 )
-from langchain.chat_models import init_chat_model
-from langfuse import get_client
-from langgraph.checkpoint.memory import InMemorySaver
+from langchain_core.language_models import BaseChatModel
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from assistant.api.config import settings
-from assistant.search.qdrant import cat_t, display_products, get_image, query_product
+from assistant.graphs.models import get_chat_model
+from assistant.graphs.prompts import SystemPrompt
+from assistant.graphs.tool_concurrency import ToolConcurrencyMiddleware
+from assistant.graphs.tool_memo import ToolMemoMiddleware
+from assistant.search.qdrant import (
+    cat_t,
+    display_products,
+    get_image,
+    get_images,
+    query_product,
+)
 
 
 class CustomAgentState(AgentState):
@@ -21,59 +34,79 @@ class CustomAgentState(AgentState):
     widget: Optional[dict[str, Any]]
 
 
-langfuse = get_client()
-SYSTEM_PROMPT = langfuse.get_prompt("shopping-assistant").compile(catalog=str(cat_t))
+system_prompt = SystemPrompt(
+    "shopping-assistant",
+    Path(settings.prompt_cache_dir),
+    refresh_interval=settings.prompt_refresh_interval,
+    catalog=str(cat_t),
+)
 MAX_TOOL_PER_RUN = 40
 
-summary_model = init_chat_model(
-    "gpt-5-nano",
-    reasoning_effort="low",
-    use_responses_api=True,
+tool_memo = ToolMemoMiddleware(
+    thread_maxsize=settings.tool_memo_thread_size,
+    thread_ttl=settings.tool_memo_thread_ttl,
 )
 
-agent_model = init_chat_model(
-    settings.model_name,
-    streaming=True,
-    temperature=0.1,
-    max_tokens=5000,
-    timeout=30,
-    reasoning_effort="low",
-    use_responses_api=True,
-)
 
-reserve = agent_model.max_tokens + 1000
-
-MAX_TOKENS_PER_RUN = agent_model.profile.get("max_input_tokens", 100_000) - reserve
-
-middleware = [
-    ToolCallLimitMiddleware(
-        thread_limit=10 * MAX_TOOL_PER_RUN,
-        run_limit=MAX_TOOL_PER_RUN,
-    ),
-    # (fast method) minimize context by clearing tool calls
-    ContextEditingMiddleware(
-        edits=[
-            ClearToolUsesEdit(
-                keep=10,
-                trigger=int(0.8 * MAX_TOKENS_PER_RUN),
-            ),
-        ],
-    ),
-    # (slow, expensive fallback) summarize convo
-    SummarizationMiddleware(
-        model=summary_model,
-        max_tokens_before_summary=MAX_TOKENS_PER_RUN,
-        messages_to_keep=20,
-    ),
-]
-
-
-def create_db_agent():
+@dynamic_prompt
+async def shopping_assistant_prompt(request: ModelRequest) -> str:
+    return await system_prompt.get()
+
+
+def create_middleware(agent_model: BaseChatModel) -> list[AgentMiddleware]:
+    summary_model = get_chat_model(
+        "gpt-5-nano",
+        reasoning_effort="low",
+        use_responses_api=True,
+    )
+
+    reserve = agent_model.max_tokens + 1000
+
+    max_tokens_per_run = agent_model.profile.get("max_input_tokens", 100_000) - reserve
+
+    return [
+        shopping_assistant_prompt,
+        # answer repeated searches/image lookups from earlier results; before
+        # the limit so its after_model hook can refund the calls it answers
+        tool_memo,
+        # parallel tool calls of one model message, at most this many at once
+        ToolConcurrencyMiddleware(settings.tool_max_concurrency),
+        ToolCallLimitMiddleware(
+            thread_limit=10 * MAX_TOOL_PER_RUN,
+            run_limit=MAX_TOOL_PER_RUN,
+        ),
+        # (fast method) minimize context by clearing tool calls
+        ContextEditingMiddleware(
+            edits=[
+                ClearToolUsesEdit(
+                    keep=10,
+                    trigger=int(0.8 * max_tokens_per_run),
+                ),
+            ],
+        ),
+        # (slow, expensive fallback) summarize convo
+        SummarizationMiddleware(
+            model=summary_model,
+            max_tokens_before_summary=max_tokens_per_run,
+            messages_to_keep=20,
+        ),
+    ]
+
+
+def create_db_agent(checkpointer: Optional[BaseCheckpointSaver] = None):
+    agent_model = get_chat_model(
+        settings.model_name,
+        streaming=True,
+        temperature=0.1,
+        max_tokens=5000,
+        timeout=30,
+        reasoning_effort="low",
+        use_responses_api=True,
+    )
     return create_agent(
         agent_model,
-        tools=[query_product, get_image, display_products],
-        checkpointer=InMemorySaver(),
-        system_prompt=SYSTEM_PROMPT,
-        middleware=middleware,
+        tools=[query_product, get_image, get_images, display_products],
+        checkpointer=checkpointer,
+        middleware=create_middleware(agent_model),
         state_schema=CustomAgentState,
     )
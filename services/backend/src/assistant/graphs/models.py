@@ -0,0 +1,89 @@
+"""
+Chat model instances shared by all graphs for the life of the process.
+
+Models are created once per distinct configuration. OpenAI models share a
+single pooled ``httpx.AsyncClient``, so connections (and their TLS sessions)
+are kept alive across requests instead of being rebuilt per call; pool limits
+come from ``Settings``.
+
+Models, and the graphs compiled with them, keep that client for good, and may
+be built before ``api.serve`` forks its workers. The client itself therefore
+holds no connections: each process opens its own pool on first use, and
+``aclose_http_client`` closes it without invalidating the client.
+"""
+
+import os
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+
+from assistant.api.config import settings
+
+_OPENAI_PREFIXES = ("gpt-", "o1", "o3", "o4", "chatgpt")
+
+
+class _ProcessPoolTransport(httpx.AsyncBaseTransport):
+    """Connection pool created lazily in the process that uses it."""
+
+    def __init__(self) -> None:
+        self._pool: Optional[httpx.AsyncHTTPTransport] = None
+        self._pid: Optional[int] = None
+
+    def _current(self) -> httpx.AsyncHTTPTransport:
+        if self._pool is None or self._pid != os.getpid():
+            # A pool inherited through fork belongs to the parent; leave it.
+            self._pool = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_keepalive_connections,
+                    keepalive_expiry=settings.llm_keepalive_expiry,
+                )
+            )
+            self._pid = os.getpid()
+        return self._pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._current().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        if self._pool is not None and self._pid == os.getpid():
+            await self._pool.aclose()
+        self._pool = None
+
+
+_transport = _ProcessPoolTransport()
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            transport=_transport,
+            timeout=httpx.Timeout(
+                settings.llm_read_timeout, connect=settings.llm_connect_timeout
+            ),
+        )
+    return _http_client
+
+
+async def aclose_http_client() -> None:
+    """Close this process's LLM connections; the next call opens new ones."""
+    await _transport.aclose()
+
+
+def is_openai_model(model: str) -> bool:
+    if ":" in model:
+        return model.split(":", 1)[0] == "openai"
+    return model.startswith(_OPENAI_PREFIXES)
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(model: str, **kwargs) -> BaseChatModel:
+    """Shared model instance for ``model`` and ``init_chat_model`` kwargs."""
+    if is_openai_model(model):
+        kwargs["http_async_client"] = http_client()
+    return init_chat_model(model, **kwargs)
@@ -0,0 +1,89 @@
+"""
+System prompts from Langfuse, cached on local disk.
+
+Nothing is fetched at import time. ``SystemPrompt.get`` serves the in-memory
+text, falling back to the copy written to disk by the last successful fetch,
+so a worker starts (and answers) without reaching Langfuse. The app lifespan
+runs ``refresh_forever`` in the background to keep both copies current; only a
+process with no cached copy at all waits for a fetch, once, in a thread.
+"""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from langfuse import get_client
+
+logger = logging.getLogger(__name__)
+
+
+class SystemPrompt:
+    def __init__(
+        self,
+        name: str,
+        cache_dir: Path,
+        refresh_interval: float = 300.0,
+        **variables: str,
+    ) -> None:
+        self.name = name
+        self.path = cache_dir / f"{name}.txt"
+        self.refresh_interval = refresh_interval
+        self.variables = variables
+        self._text: Optional[str] = None
+        self._load_lock = asyncio.Lock()
+
+    def _read_cache(self) -> Optional[str]:
+        try:
+            return self.path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def _write_cache(self, text: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def fetch(self) -> str:
+        """Compile the current prompt from Langfuse and update both caches."""
+        prompt = get_client().get_prompt(self.name, cache_ttl_seconds=0)
+        text = prompt.compile(**self.variables)
+        if text != self._text:
+            self._write_cache(text)
+            self._text = text
+        return text
+
+    def _load(self) -> str:
+        return self._read_cache() or self.fetch()
+
+    async def get(self) -> str:
+        if self._text is None:
+            async with self._load_lock:
+                if self._text is None:
+                    self._text = await asyncio.to_thread(self._load)
+        return self._text
+
+    async def refresh_forever(self, delay: float = 0.0) -> None:
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                await asyncio.to_thread(self.fetch)
+            except Exception:
+                logger.exception("Refreshing prompt %r failed", self.name)
+            await asyncio.sleep(self.refresh_interval)
+
+    async def start(self) -> asyncio.Task:
+        """Start background refreshes.
+
+        Waits for a first fetch only if nothing is cached.
+        """
+        delay = 0.0
+        if self._text is None and self._read_cache() is None:
+            try:
+                await asyncio.to_thread(self.fetch)
+                delay = self.refresh_interval
+            except Exception:
+                logger.exception("Fetching prompt %r failed", self.name)
+        return asyncio.create_task(self.refresh_forever(delay))
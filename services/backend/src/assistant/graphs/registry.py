@@ -0,0 +1,74 @@
+"""
+Compiled graphs shared by every entry point of the process.
+
+Routers and the ChatKit server ask for a graph by name instead of building
+their own, so they all run the same compiled graph over the same checkpointer
+and see the same threads. Evaluation jobs run the same compiled graph over a
+throwaway checkpointer (``get_isolated_graph``), keeping their threads out of
+the production one. Importing the app compiles
+nothing; graphs are built on first use, or up front by ``preload``.
+
+Compilation is split for pre-forked servers: ``preload`` compiles each graph
+without a checkpointer in the parent process, where forked workers inherit it
+copy-on-write. A worker then only attaches its own checkpointer (SQLite
+connections must not cross a fork) with a cheap ``copy``.
+"""
+
+from typing import Callable, Iterable, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph.state import CompiledStateGraph
+
+from assistant.graphs.chat import create_graph
+from assistant.graphs.checkpoint import create_checkpointer
+from assistant.graphs.db_agent import create_db_agent
+
+GraphFactory = Callable[[Optional[BaseCheckpointSaver]], CompiledStateGraph]
+
+GRAPHS: dict[str, GraphFactory] = {
+    "chat": create_graph,
+    "db_agent": create_db_agent,
+}
+
+# Compiled without a checkpointer; safe to build before forking.
+_templates: dict[str, CompiledStateGraph] = {}
+_checkpointers: dict[str, BaseCheckpointSaver] = {}
+_graphs: dict[str, CompiledStateGraph] = {}
+
+
+def _template(name: str) -> CompiledStateGraph:
+    template = _templates.get(name)
+    if template is None:
+        template = _templates[name] = GRAPHS[name](None)
+    return template
+
+
+def get_checkpointer(name: str) -> BaseCheckpointSaver:
+    checkpointer = _checkpointers.get(name)
+    if checkpointer is None:
+        checkpointer = _checkpointers[name] = create_checkpointer(name)
+    return checkpointer
+
+
+def get_graph(name: str) -> CompiledStateGraph:
+    graph = _graphs.get(name)
+    if graph is None:
+        graph = _graphs[name] = _template(name).copy(
+            {"checkpointer": get_checkpointer(name)}
+        )
+    return graph
+
+
+def get_isolated_graph(name: str) -> CompiledStateGraph:
+    """The compiled graph over a new in-memory checkpointer of its own.
+
+    Its threads are visible nowhere else and go away with the returned graph.
+    """
+    return _template(name).copy({"checkpointer": InMemorySaver()})
+
+
+def preload(names: Optional[Iterable[str]] = None) -> None:
+    """Compile graphs ahead of the first request (or of forking workers)."""
+    for name in names or GRAPHS:
+        _template(name)
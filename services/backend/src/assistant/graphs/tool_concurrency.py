@@ -0,0 +1,57 @@
+"""
+Concurrency cap for the agent's parallel tool calls.
+
+The tool calls of one model message already run concurrently, one graph task
+each. ``ToolConcurrencyMiddleware`` bounds how many of them run at the same
+time within a thread, so a message with a dozen lookups does not fire a
+dozen Qdrant queries (and image fetches) at once.
+"""
+
+import asyncio
+from typing import Awaitable, Callable
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.agents.middleware.types import ToolCallRequest
+from langchain_core.messages import ToolMessage
+from langgraph.config import get_config
+from langgraph.types import Command
+
+
+class ToolConcurrencyMiddleware(AgentMiddleware):
+    def __init__(self, max_concurrency: int = 4) -> None:
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        # thread id -> (semaphore, calls using it); dropped when unused.
+        self._slots: dict[str, tuple[asyncio.Semaphore, int]] = {}
+        self.waited = 0
+
+    def _acquire_slot(self, thread_id: str) -> asyncio.Semaphore:
+        semaphore, users = self._slots.get(
+            thread_id, (asyncio.Semaphore(self.max_concurrency), 0)
+        )
+        self._slots[thread_id] = (semaphore, users + 1)
+        return semaphore
+
+    def _release_slot(self, thread_id: str) -> None:
+        semaphore, users = self._slots[thread_id]
+        if users <= 1:
+            del self._slots[thread_id]
+        else:
+            self._slots[thread_id] = (semaphore, users - 1)
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        if self.max_concurrency <= 0:
+            return await handler(request)
+        thread_id = str(get_config()["configurable"].get("thread_id", ""))
+        semaphore = self._acquire_slot(thread_id)
+        try:
+            if semaphore.locked():
+                self.waited += 1
+            async with semaphore:
+                return await handler(request)
+        finally:
+            self._release_slot(thread_id)
@@ -0,0 +1,250 @@
+"""
+Memoization of read-only tool calls for the shopping agent.
+
+The agent loop often repeats a ``query_product`` search or a ``get_image(s)``
+lookup it already made. ``ToolMemoMiddleware`` answers such calls from the
+result of the earlier call instead of running the tool again. Results are
+kept for the current run and, up to a TTL, for the whole thread.
+
+Calls are matched on canonicalized arguments:
+- whitespace is normalized
+- ``groups``/``genders`` are sorted and deduplicated
+- prices are rounded to whole units
+- for searches, the retrieval profile is part of the key
+
+Calls already memoized when the model makes them are answered right after
+the model call, so they never reach the tool node. Placed before
+``ToolCallLimitMiddleware``, whose ``after_model`` hook then runs first, the
+middleware refunds these calls from the limiter's counts: a memo hit does not
+use the tool call budget, and a hit the limiter blocked gets its cached answer
+instead of the error. The limiter still counts hits when it decides on the
+message that reaches the limit, so there it may block calls the refund
+would have left room for.
+
+Identical calls made in parallel share one execution. Only plain
+``ToolMessage`` results are cached. Tools that update state
+(``display_products`` returns a ``Command``) and error results always run.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.agents.middleware.types import ToolCallRequest
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langgraph.config import get_config
+from langgraph.types import Command
+
+from assistant.search.embeddings import normalize_text
+from assistant.search.profiles import current_profile
+from assistant.utils.cache import TTLCache
+
+Canonicalizer = Callable[[dict[str, Any]], Any]
+
+# State keys of ToolCallLimitMiddleware: count key ("__all__" or a tool name)
+# -> calls counted.
+LIMIT_COUNT_KEYS = ("thread_tool_call_count", "run_tool_call_count")
+
+
+def _price(value: Optional[float]) -> Optional[int]:
+    return None if value is None else round(value)
+
+
+def _unordered(values: Optional[list[str]]) -> tuple[str, ...]:
+    return tuple(sorted({v.strip() for v in values or [] if v.strip()}))
+
+
+def canonical_query_product(args: dict[str, Any]) -> Any:
+    return (
+        normalize_text(args.get("name", "")),
+        normalize_text(args.get("description", "")),
+        _unordered(args.get("groups")),
+        _unordered(args.get("genders")),
+        _price(args.get("min_price")),
+        _price(args.get("max_price")),
+        current_profile().name,
+    )
+
+
+def canonical_get_image(args: dict[str, Any]) -> Any:
+    return (args.get("code", "").strip(), args.get("limit"))
+
+
+def canonical_get_images(args: dict[str, Any]) -> Any:
+    # Order is kept: it is the order of the images in the result.
+    codes = dict.fromkeys(c.strip() for c in args.get("codes") or [] if c.strip())
+    return (tuple(codes), args.get("limit"))
+
+
+CANONICALIZERS: dict[str, Canonicalizer] = {
+    "query_product": canonical_query_product,
+    "get_image": canonical_get_image,
+    "get_images": canonical_get_images,
+}
+
+
+def _thread_id() -> str:
+    try:
+        return str(get_config()["configurable"].get("thread_id", ""))
+    except RuntimeError:
+        return ""
+
+
+class ToolMemoMiddleware(AgentMiddleware):
+    def __init__(
+        self,
+        canonicalizers: dict[str, Canonicalizer] = CANONICALIZERS,
+        thread_maxsize: int = 2000,
+        thread_ttl: float = 300.0,
+        max_runs: int = 1000,
+    ) -> None:
+        super().__init__()
+        self.canonicalizers = canonicalizers
+        # Run scope: thread id -> {key: message}, reset when a run starts.
+        self._runs: TTLCache[str, dict[Any, ToolMessage]] = TTLCache(max_runs)
+        self._thread: Optional[TTLCache[Any, ToolMessage]] = (
+            TTLCache(maxsize=thread_maxsize, ttl=thread_ttl) if thread_ttl > 0 else None
+        )
+        # Calls still running, so parallel duplicates wait for the first one.
+        self._pending: dict[tuple[str, Any], asyncio.Future] = {}
+        self.calls = 0
+        self.run_hits = 0
+        self.thread_hits = 0
+
+    async def abefore_agent(self, state, runtime) -> None:
+        self._runs.set(_thread_id(), {})
+
+    async def aafter_agent(self, state, runtime) -> None:
+        self._runs.pop(_thread_id())
+
+    def _key(self, tool_call: ToolCall) -> Optional[Any]:
+        name = tool_call["name"]
+        canonicalize = self.canonicalizers.get(name)
+        if canonicalize is None:
+            return None
+        try:
+            key = (name, canonicalize(tool_call.get("args") or {}))
+            hash(key)
+        except (TypeError, AttributeError, ValueError):
+            # Malformed arguments: not memoized, the tool node reports them.
+            return None
+        return key
+
+    def _lookup(self, thread_id: str, key: Any) -> Optional[ToolMessage]:
+        run = self._runs.get(thread_id, count=False)
+        if run is not None and key in run:
+            self.run_hits += 1
+            return run[key]
+        if self._thread is not None:
+            message = self._thread.get((thread_id, key))
+            if message is not None:
+                self.thread_hits += 1
+                if run is not None:
+                    run[key] = message
+                return message
+        return None
+
+    async def aafter_model(self, state, runtime) -> Optional[dict[str, Any]]:
+        """Answer the memoized calls of the last model message and refund them."""
+        messages = state.get("messages") or []
+        answers: dict[str, ToolMessage] = {}
+        ai_message = None
+        for message in reversed(messages):
+            if isinstance(message, AIMessage):
+                ai_message = message
+                break
+            if isinstance(message, ToolMessage):
+                answers[message.tool_call_id] = message
+        if ai_message is None or not ai_message.tool_calls:
+            return None
+
+        thread_id = _thread_id()
+        hits: list[ToolMessage] = []
+        # State key -> count key -> calls to refund.
+        refunds: dict[str, dict[str, int]] = {k: {} for k in LIMIT_COUNT_KEYS}
+        for tool_call in ai_message.tool_calls:
+            answer = answers.get(tool_call["id"])
+            # The limiter answers the calls it blocks with an error, and counts
+            # them in the run only; anything else is a real answer.
+            if answer is not None and answer.status != "error":
+                continue
+            key = self._key(tool_call)
+            if key is None:
+                continue
+            cached = self._lookup(thread_id, key)
+            if cached is None:
+                continue
+            self.calls += 1
+            hits.append(
+                cached.model_copy(
+                    update={
+                        "tool_call_id": tool_call["id"],
+                        # Replaces the limiter's error message, if any.
+                        "id": answer.id if answer is not None else None,
+                    }
+                )
+            )
+            counted = LIMIT_COUNT_KEYS if answer is None else ("run_tool_call_count",)
+            for state_key in counted:
+                for count_key in ("__all__", tool_call["name"]):
+                    refund = refunds[state_key]
+                    refund[count_key] = refund.get(count_key, 0) + 1
+        if not hits:
+            return None
+
+        update: dict[str, Any] = {"messages": hits}
+        for state_key, refund in refunds.items():
+            counts = state.get(state_key)
+            if counts and refund:
+                update[state_key] = {
+                    k: max(0, n - refund.get(k, 0)) for k, n in counts.items()
+                }
+        return update
+
+    async def awrap_tool_call(
+        self,
+        request: ToolCallRequest,
+        handler: Callable[[ToolCallRequest], Awaitable[ToolMessage | Command]],
+    ) -> ToolMessage | Command:
+        key = self._key(request.tool_call)
+        if key is None:
+            return await handler(request)
+        self.calls += 1
+        thread_id = _thread_id()
+        cached = self._lookup(thread_id, key)
+        pending = self._pending.get((thread_id, key))
+        if cached is None and pending is not None:
+            cached = await asyncio.shield(pending)
+            if cached is not None:
+                self.run_hits += 1
+        if cached is not None:
+            return cached.model_copy(
+                update={"tool_call_id": request.tool_call["id"], "id": None}
+            )
+
+        future = self._pending[(thread_id, key)] = (
+            asyncio.get_running_loop().create_future()
+        )
+        cacheable = None
+        try:
+            result = await handler(request)
+            if isinstance(result, ToolMessage) and result.status != "error":
+                cacheable = result
+                run = self._runs.get(thread_id, count=False)
+                if run is not None:
+                    run[key] = result
+                if self._thread is not None:
+                    self._thread.set((thread_id, key), result)
+            return result
+        finally:
+            del self._pending[(thread_id, key)]
+            future.set_result(cacheable)
+
+    def stats(self) -> dict[str, float]:
+        hits = self.run_hits + self.thread_hits
+        return {
+            "calls": self.calls,
+            "run_hits": self.run_hits,
+            "thread_hits": self.thread_hits,
+            "dedupe_rate": hits / self.calls if self.calls else 0.0,
+        }
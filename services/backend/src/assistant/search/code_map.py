@@ -0,0 +1,94 @@
+"""
+Color code -> (point id, color index) map for the product collection.
+
+``fill_db`` writes the map next to the data after every rebuild or sync; the
+search tools load it lazily and reload it when the file changes, so a color
+code resolves to a single ``retrieve`` by point id instead of a filtered query.
+
+Point ids themselves are derived from the product slug (``product_point_id``),
+so a product can be fetched by slug without any index at all.
+"""
+
+import json
+import os
+from pathlib import Path
+from time import monotonic
+from typing import Iterable, Iterator, Optional, Union
+from uuid import UUID, uuid5
+
+PointId = Union[int, str]
+
+PRODUCT_NAMESPACE = UUID("5b0f4f0e-6f43-4d55-9a3c-2f1f0f6c8e21")
+
+
+def product_point_id(slug: str) -> str:
+    """Deterministic Qdrant point id for a product slug (UUIDv5)."""
+    return str(uuid5(PRODUCT_NAMESPACE, slug))
+
+
+def with_point_ids(points: Iterable[dict]) -> Iterator[dict]:
+    """Re-key products by ``product_point_id`` of their slug."""
+    for p in points:
+        yield {"id": product_point_id(p["payload"]["slug"]), "payload": p["payload"]}
+
+
+def track_codes(
+    points: Iterable[dict], codes: dict[str, tuple[PointId, int]]
+) -> Iterator[dict]:
+    """Pass products through, recording each color code's point id and index."""
+    for p in points:
+        for idx, color in enumerate(p["payload"].get("colors") or []):
+            code = color.get("code")
+            if code:
+                codes[code] = (p["id"], idx)
+        yield p
+
+
+def write_code_map(path: Path, codes: dict[str, tuple[PointId, int]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(codes, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class CodeMap:
+    """Lazily loaded view of the code map file, reloaded when its mtime changes.
+
+    The file is checked at most every ``check_interval`` seconds. A missing file
+    simply yields no matches, and callers fall back to a filtered query.
+    """
+
+    def __init__(self, path: Path, check_interval: float = 5.0) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self._codes: dict[str, tuple[PointId, int]] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at: Optional[float] = None
+
+    def _refresh(self) -> None:
+        now = monotonic()
+        if (
+            self._checked_at is not None
+            and now - self._checked_at < self.check_interval
+        ):
+            return
+        self._checked_at = now
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            self._codes, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path, encoding="utf-8") as f:
+            self._codes = {code: tuple(loc) for code, loc in json.load(f).items()}
+        self._mtime = mtime
+
+    def get(self, code: str) -> Optional[tuple[PointId, int]]:
+        self._refresh()
+        return self._codes.get(code)
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._codes)
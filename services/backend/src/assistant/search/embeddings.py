@@ -0,0 +1,196 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from assistant.api.config import settings
+from assistant.utils.cache import TTLCache
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class CachedEmbeddings:
+    """Query embedding layer with batching and an LRU/TTL cache.
+
+    All texts of one call are embedded in a single batched request, and
+    vectors are cached by ``(model, normalized text)`` so repeated searches
+    skip the embedding model entirely.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        maxsize: int = 2048,
+        ttl: Optional[float] = 3600.0,
+    ) -> None:
+        self.embeddings = embeddings
+        self.model = model
+        self.cache: TTLCache[tuple[str, str], list[float]] = TTLCache(maxsize, ttl)
+        self._inflight: dict[tuple[str, str], asyncio.Future[list[float]]] = {}
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        keys = [(self.model, normalize_text(t)) for t in texts]
+        vectors: dict[tuple[str, str], list[float]] = {}
+        pending: dict[tuple[str, str], asyncio.Future[list[float]]] = {}
+        missing: list[tuple[str, str]] = []
+
+        for key in dict.fromkeys(keys):
+            cached = self.cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+            elif key in self._inflight:
+                pending[key] = self._inflight[key]
+            else:
+                missing.append(key)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            self._inflight.update(futures)
+            try:
+                embedded = await self.embeddings.aembed_documents(
+                    [text for _, text in missing]
+                )
+            except asyncio.CancelledError:
+                for future in futures.values():
+                    future.cancel()
+                raise
+            except Exception as exc:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(exc)
+                        # Mark retrieved so waiter-less futures do not warn.
+                        future.exception()
+                raise
+            finally:
+                for key in missing:
+                    self._inflight.pop(key, None)
+            for key, vector in zip(missing, embedded):
+                self.cache.set(key, vector)
+                if not futures[key].done():
+                    futures[key].set_result(vector)
+                vectors[key] = vector
+
+        for key, future in pending.items():
+            # Shielded: a cancelled waiter must not cancel the shared future.
+            vectors[key] = await asyncio.shield(future)
+
+        return [vectors[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_queries([text]))[0]
+
+    def stats(self) -> dict[str, float]:
+        return self.cache.stats()
+
+
+def _require_fastembed():
+    try:
+        from fastembed import TextEmbedding
+    except ImportError as exc:
+        raise ImportError(
+            "The local embedding backend requires fastembed: uv sync --extra fastembed"
+        ) from exc
+    return TextEmbedding
+
+
+class LocalEmbeddings(Embeddings):
+    """In-process CPU embeddings from a quantized ONNX model (fastembed).
+
+    Texts are embedded in ``batch_size`` chunks spread over a pool of
+    ``workers`` threads. ONNX Runtime releases the GIL, so chunks run in
+    parallel and the event loop is never blocked.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        workers: int = 4,
+        batch_size: int = 32,
+        cache_dir: Optional[str] = None,
+    ) -> None:
+        TextEmbedding = _require_fastembed()
+        self.batch_size = batch_size
+        self._model = TextEmbedding(
+            model_name=model,
+            cache_dir=cache_dir,
+            threads=max(1, (os.cpu_count() or 1) // workers),
+        )
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="embed")
+
+    def _embed(self, texts: list[str]) -> list[list[float]]:
+        return [v.tolist() for v in self._model.embed(texts, batch_size=len(texts))]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [
+            v.tolist() for v in self._model.embed(texts, batch_size=self.batch_size)
+        ]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self._executor, self._embed, texts[i : i + self.batch_size]
+                )
+                for i in range(0, len(texts), self.batch_size)
+            )
+        )
+        return [v for chunk in chunks for v in chunk]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def create_embeddings() -> Embeddings:
+    """Embedding backend selected by ``settings.embedding_backend``."""
+    if settings.embedding_backend == "local":
+        return LocalEmbeddings(
+            settings.embedding_model,
+            workers=settings.embedding_workers,
+            batch_size=settings.embedding_batch_size,
+            cache_dir=settings.embedding_cache_dir,
+        )
+    from langchain_ollama import OllamaEmbeddings
+
+    return OllamaEmbeddings(model=settings.embedding_model)
+
+
+def embedding_id() -> str:
+    return f"{settings.embedding_backend}:{settings.embedding_model}"
+
+
+def embedding_metadata(dim: int) -> dict[str, Any]:
+    """Collection metadata recording which model produced its vectors."""
+    return {"embedding": embedding_id(), "embedding_dim": dim}
+
+
+def metadata_mismatch(
+    metadata: Optional[dict[str, Any]],
+    vectors: Optional[dict[str, Any]] = None,
+    dim: Optional[int] = None,
+) -> Optional[str]:
+    """Describe why vectors in a collection are incompatible, or None if they match.
+
+    Without recorded metadata the model is unknown and only the size of the
+    dense ``vectors`` is checked against the configured model's ``dim``.
+    """
+    stored = (metadata or {}).get("embedding")
+    if stored is not None and stored != embedding_id():
+        return f"was embedded with {stored!r}, but {embedding_id()!r} is configured"
+    if dim is not None:
+        for name, params in (vectors or {}).items():
+            if params.size != dim:
+                return (
+                    f"stores {params.size}-dim {name!r} vectors, but "
+                    f"{embedding_id()!r} embeds {dim} dimensions"
+                )
+    return None
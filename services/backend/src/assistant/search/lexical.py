@@ -0,0 +1,69 @@
+"""
+Local BM25 sparse vectors for the ``lex`` named vector.
+
+Text is case-folded, stripped of diacritics and split into word tokens;
+hyphenated codes are also indexed with the hyphens removed so ``ab-123`` and
+``ab123`` match. Tokens are feature-hashed with crc32, so no vocabulary has to
+be stored or shared between ingestion and queries.
+
+Documents carry the BM25 term-frequency part of the score; Qdrant applies IDF
+at query time (``Modifier.IDF`` on the collection), and queries are plain
+token sets.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from zlib import crc32
+
+from qdrant_client import models
+
+VECTOR_NAME = "lex"
+K1 = 1.2
+B = 0.75
+# Typical token count of name + description + codes; only sets the length
+# normalisation point, so a rough estimate is enough.
+AVG_DOC_LEN = 64.0
+
+_WORD = re.compile(r"\w+(?:-\w+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    tokens = []
+    for word in _WORD.findall(text):
+        if "-" in word:
+            parts = word.split("-")
+            tokens.extend(p for p in parts if p)
+            tokens.append("".join(parts))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def _index(token: str) -> int:
+    return crc32(token.encode())
+
+
+def document_text(payload: dict) -> str:
+    codes = " ".join(c.get("code") or "" for c in payload.get("colors") or [])
+    return " ".join(
+        [payload.get("name", ""), payload.get("description_plain", ""), codes]
+    )
+
+
+def document_vector(text: str) -> models.SparseVector:
+    tokens = tokenize(text)
+    norm = K1 * (1 - B + B * len(tokens) / AVG_DOC_LEN)
+    tf: Counter[int] = Counter(_index(t) for t in tokens)
+    indices = sorted(tf)
+    return models.SparseVector(
+        indices=indices,
+        values=[tf[i] * (K1 + 1) / (tf[i] + norm) for i in indices],
+    )
+
+
+def query_vector(text: str) -> models.SparseVector:
+    indices = sorted({_index(t) for t in tokenize(text)})
+    return models.SparseVector(indices=indices, values=[1.0] * len(indices))
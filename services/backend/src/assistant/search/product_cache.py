@@ -0,0 +1,44 @@
+from typing import Optional
+
+from assistant.utils.cache import TTLCache
+
+
+class ProductCache:
+    """Process-local cache of product payloads, keyed by color code and by slug.
+
+    ``query_product`` results are stored here so that ``display_products`` and
+    ``get_image`` can usually be answered without another Qdrant round trip.
+    Entries expire after ``ttl`` seconds; the least recently used are evicted
+    beyond ``maxsize`` entries per key.
+    """
+
+    def __init__(self, maxsize: int = 5000, ttl: Optional[float] = 600.0) -> None:
+        self.by_code: TTLCache[str, tuple[dict, int]] = TTLCache(maxsize, ttl)
+        self.by_slug: TTLCache[str, dict] = TTLCache(maxsize, ttl)
+
+    def put(self, payload: dict) -> None:
+        slug = payload.get("slug")
+        if slug:
+            self.by_slug.set(slug, payload)
+        for idx, color in enumerate(payload.get("colors") or []):
+            code = color.get("code")
+            if code:
+                self.by_code.set(code, (payload, idx))
+
+    def get_variant(self, code: str) -> Optional[tuple[dict, dict]]:
+        """Return ``(product payload, color)`` for a color code, if cached."""
+        entry = self.by_code.get(code)
+        if entry is None:
+            return None
+        payload, idx = entry
+        return payload, payload["colors"][idx]
+
+    def get_product(self, slug: str) -> Optional[dict]:
+        return self.by_slug.get(slug)
+
+    def clear(self) -> None:
+        self.by_code.clear()
+        self.by_slug.clear()
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {"by_code": self.by_code.stats(), "by_slug": self.by_slug.stats()}
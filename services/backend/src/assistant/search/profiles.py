@@ -0,0 +1,77 @@
+"""
+Retrieval profiles trading latency for recall in ``query_product``.
+
+A profile sets how many candidates each vector leg prefetches and the
+search-time HNSW / quantization parameters. How vectors are stored (quantized,
+on disk or in RAM) is a collection setting chosen at ingest, see
+``fill_db --quantization/--on-disk``; profiles only decide how to search it.
+
+The profile is picked per request through
+``config["configurable"]["retrieval_profile"]`` and defaults to
+``settings.retrieval_profile``.
+"""
+
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+from langgraph.config import get_config
+from qdrant_client import models
+
+from assistant.api.config import settings
+
+profile_t = Literal["fast", "balanced", "accurate"]
+
+
+@dataclass(frozen=True)
+class RetrievalProfile:
+    name: str
+    prefetch_limit: int
+    hnsw_ef: Optional[int] = None
+    # Re-score quantized candidates with the original vectors.
+    rescore: bool = True
+    oversampling: Optional[float] = None
+    # Answer from the lexical leg alone when its top hit is unambiguous.
+    lexical_fast_path: bool = False
+    # Brute-force, full precision search; a reference for benchmarks.
+    exact: bool = False
+
+    def search_params(self) -> models.SearchParams:
+        return models.SearchParams(
+            hnsw_ef=self.hnsw_ef,
+            exact=self.exact,
+            quantization=models.QuantizationSearchParams(
+                ignore=self.exact,
+                rescore=self.rescore,
+                oversampling=self.oversampling,
+            ),
+        )
+
+
+PROFILES: dict[str, RetrievalProfile] = {
+    "fast": RetrievalProfile(
+        "fast", prefetch_limit=10, hnsw_ef=32, rescore=False, lexical_fast_path=True
+    ),
+    "balanced": RetrievalProfile(
+        "balanced",
+        prefetch_limit=20,
+        hnsw_ef=64,
+        oversampling=2.0,
+        lexical_fast_path=True,
+    ),
+    "accurate": RetrievalProfile(
+        "accurate", prefetch_limit=50, hnsw_ef=256, oversampling=4.0
+    ),
+}
+
+
+def get_profile(name: Optional[str] = None) -> RetrievalProfile:
+    return PROFILES[name or settings.retrieval_profile]
+
+
+def current_profile() -> RetrievalProfile:
+    """Profile requested by the running graph's config, or the default."""
+    try:
+        configurable = get_config().get("configurable", {})
+    except RuntimeError:
+        configurable = {}
+    return get_profile(configurable.get("retrieval_profile"))
@@ -1,9 +1,11 @@
+import logging
+from functools import lru_cache
+from pathlib import Path
 from typing import Annotated, Literal, Optional
 
 from langchain.tools import tool
 from langchain_core.messages import ToolMessage
 from langchain_core.tools import InjectedToolCallId
-from langchain_ollama import OllamaEmbeddings
 from langgraph.config import get_stream_writer
 from langgraph.types import Command
 from pydantic import BaseModel, Field, constr
@@ -11,17 +13,76 @@ from qdrant_client import AsyncQdrantClient, models
 from qdrant_client.http.models import MatchAny
 
 from assistant.api.config import settings
+from assistant.search import lexical
+from assistant.search.code_map import CodeMap, product_point_id
+from assistant.search.embeddings import (
+    CachedEmbeddings,
+    create_embeddings,
+    embedding_id,
+    metadata_mismatch,
+)
+from assistant.search.product_cache import ProductCache
+from assistant.search.profiles import RetrievalProfile, current_profile
+from assistant.utils.metrics import EMBEDDING, QDRANT_QUERY
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[AsyncQdrantClient] = None
+
+
+def qdrant_client() -> AsyncQdrantClient:
+    global _client
+    if _client is None:
+        _client = AsyncQdrantClient(
+            host=settings.qdrant_host,
+            port=settings.qdrant_port,
+            api_key=settings.qdrant_api_key.get_secret_value(),
+            grpc_port=settings.qdrant_grpc_port,
+            https=False,
+            prefer_grpc=True,
+        )
+    return _client
+
 
-client = AsyncQdrantClient(
-    host=settings.qdrant_host,
-    port=settings.qdrant_port,
-    api_key=settings.qdrant_api_key.get_secret_value(),
-    grpc_port=settings.qdrant_grpc_port,
-    https=False,
-    prefer_grpc=True,
+async def aclose_qdrant_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+@lru_cache(maxsize=None)
+def query_embeddings() -> CachedEmbeddings:
+    return CachedEmbeddings(
+        create_embeddings(),
+        model=embedding_id(),
+        maxsize=settings.embedding_cache_size,
+        ttl=settings.embedding_cache_ttl,
+    )
+
+
+product_cache = ProductCache(
+    maxsize=settings.product_cache_size,
+    ttl=settings.product_cache_ttl,
 )
 
-embeddings = OllamaEmbeddings(model="qwen3-embedding:4b")
+code_map = CodeMap(Path(settings.product_code_map_path))
+
+# Fields kept in the product cache; images are cached for display_products and
+# get_image but not sent back to the model.
+PRODUCT_FIELDS = [
+    "slug",
+    "name",
+    "description_plain",
+    "group",
+    "subgroup",
+    "gender",
+    "colors[].code",
+    "colors[].color",
+    "colors[].url",
+    "colors[].price",
+    "colors[].images",
+]
 
 cat_t = Literal["BOTY", "OBLEČENÍ", "BRÝLE", "DOPLŇKY", "VÝSTROJ", "OSTATNÍ"]
 gender_t = Literal["Dětské", "Dámské", "Pánské", "Uni"]
@@ -56,10 +117,22 @@ async def product_by_uuid(uuid: str) -> dict:
     Returns:
         Product payload if found, empty dict otherwise.
     """
-    point = await client.query_points(collection_name="products", query=uuid)
-    if not point.points:
-        return {}
-    return point.points[0].payload
+    payload = (await payloads_by_slug([uuid])).get(uuid)
+    return for_model(payload) if payload is not None else {}
+
+
+@tool(parse_docstring=True)
+async def products_by_uuid(uuids: list[str]) -> list[dict]:
+    """Find several products by their unique identifiers in one call.
+
+    Args:
+        uuids: The unique identifiers (slugs) of the products to retrieve.
+
+    Returns:
+        Payloads of the products found, in the order requested.
+    """
+    payloads = await payloads_by_slug(uuids)
+    return [for_model(payloads[u]) for u in dict.fromkeys(uuids) if u in payloads]
 
 
 @tool(
@@ -78,72 +151,299 @@ async def query_product(
     writer = get_stream_writer()
     writer("Searching for products...")  # Progress message only
 
-    groups_unique = list(set(groups))
-    genders_unique = list(set(genders))
+    points = await search_products(
+        name,
+        description,
+        product_filter(groups, genders, min_price, max_price),
+        current_profile(),
+    )
 
-    name_emb = await embeddings.aembed_query(name)
-    desc_emb = await embeddings.aembed_query(description)
+    products = []
+    for x in points:
+        product_cache.put(x.payload)
+        products.append(for_model(x.payload))
 
-    filters = [
-        models.FieldCondition(
-            key="colors[].price",
-            range=models.Range(
-                gte=min_price,
-                lte=max_price,
-            ),
-        ),
-    ]
+    return products
+
+
+def product_filter(
+    groups: list[str],
+    genders: list[str],
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> Optional[models.Filter]:
+    filters = []
+    if min_price is not None or max_price is not None:
+        filters.append(
+            models.FieldCondition(
+                key="colors[].price",
+                range=models.Range(gte=min_price, lte=max_price),
+            )
+        )
     if groups:
         filters.append(
-            models.FieldCondition(key="group", match=MatchAny(any=groups_unique))
+            models.FieldCondition(key="group", match=MatchAny(any=list(set(groups))))
         )
-
     if genders:
         filters.append(
-            models.FieldCondition(key="gender", match=MatchAny(any=genders_unique))
+            models.FieldCondition(key="gender", match=MatchAny(any=list(set(genders))))
         )
+    return models.Filter(must=filters) if filters else None
 
-    global_filter = models.Filter(must=filters)
 
-    res = await client.query_points(
-        collection_name="products",
-        prefetch=[
-            models.Prefetch(
-                query=name_emb,
-                using="name_emb",
-                limit=10,
-                filter=global_filter,
-            ),
+async def search_products(
+    name: str,
+    description: str,
+    query_filter: Optional[models.Filter],
+    profile: RetrievalProfile,
+    limit: int = 10,
+    with_payload: list[str] | bool = PRODUCT_FIELDS,
+) -> list[models.ScoredPoint]:
+    """Hybrid search fusing the name, description and lexical (BM25) legs with DBSF.
+
+    The filter is applied inside each prefetch only: fusion just re-ranks the
+    already filtered candidates, so filtering again would be redundant work.
+    With ``profile.lexical_fast_path``, the lexical leg runs first and its
+    results are returned as is when the best match is a clear winner (exact
+    names, product codes), skipping the dense embeddings altogether. Both
+    lexical steps are skipped on a collection without the lexical vector.
+    """
+    lex_query = lexical.query_vector(name) if await has_lexical_vector() else None
+    if profile.lexical_fast_path and lex_query is not None and lex_query.indices:
+        with QDRANT_QUERY.labels("lexical").time():
+            res = await qdrant_client().query_points(
+                collection_name="products",
+                query=lex_query,
+                using=lexical.VECTOR_NAME,
+                query_filter=query_filter,
+                limit=max(limit, 2),
+                with_payload=with_payload,
+            )
+        if lexical_confident(res.points):
+            return [p for p in res.points[:limit] if p.score > 0]
+
+    with EMBEDDING.time():
+        name_emb, desc_emb = await query_embeddings().aembed_queries(
+            [name, description]
+        )
+    await check_collection_embedding(len(name_emb))
+    params = profile.search_params()
+    prefetch = [
+        models.Prefetch(
+            query=name_emb,
+            using="name_emb",
+            limit=profile.prefetch_limit,
+            filter=query_filter,
+            params=params,
+        ),
+        models.Prefetch(
+            query=desc_emb,
+            using="desc_emb",
+            limit=profile.prefetch_limit,
+            filter=query_filter,
+            params=params,
+        ),
+    ]
+    if lex_query is not None and lex_query.indices:
+        prefetch.append(
             models.Prefetch(
-                query=desc_emb,
-                using="desc_emb",
-                limit=10,
-                filter=global_filter,
-            ),
-        ],
-        query=models.FusionQuery(fusion=models.Fusion.DBSF),
-        query_filter=global_filter,
-        limit=10,
-        with_payload=[
-            "slug",
-            "name",
-            "description_plain",
-            "group",
-            "subgroup",
-            "gender",
-            "colors[].code",
-            "colors[].color",
-            "colors[].url",
-            "colors[].price",
-        ],
+                query=lex_query,
+                using=lexical.VECTOR_NAME,
+                limit=profile.prefetch_limit,
+                filter=query_filter,
+            )
+        )
+    with QDRANT_QUERY.labels("hybrid").time():
+        res = await qdrant_client().query_points(
+            collection_name="products",
+            prefetch=prefetch,
+            query=models.FusionQuery(fusion=models.Fusion.DBSF),
+            limit=limit,
+            with_payload=with_payload,
+        )
+    return res.points
+
+
+_embedding_checked = False
+_lexical_vector: Optional[bool] = None
+
+
+async def has_lexical_vector() -> bool:
+    """Whether the collection has the lexical (BM25) sparse vector; checked once.
+
+    Collections built before it was added are searched with the dense legs
+    only, with a one-time warning, until they are rebuilt.
+    """
+    global _lexical_vector
+    if _lexical_vector is None:
+        config = (await qdrant_client().get_collection("products")).config
+        _lexical_vector = lexical.VECTOR_NAME in (config.params.sparse_vectors or {})
+        if not _lexical_vector:
+            logger.warning(
+                "Collection 'products' has no %r vector, so searches skip the "
+                "lexical leg; rebuild it to add one",
+                lexical.VECTOR_NAME,
+            )
+    return _lexical_vector
+
+
+async def check_collection_embedding(dim: int) -> None:
+    """Refuse to search vectors produced by a different embedding model.
+
+    A collection without embedding metadata (built before it was recorded) is
+    searched with a one-time warning, unless its vector size differs from
+    ``dim``, the size of the configured model's query vectors.
+    """
+    global _embedding_checked
+    if _embedding_checked:
+        return
+    config = (await qdrant_client().get_collection("products")).config
+    problem = metadata_mismatch(config.metadata, config.params.vectors, dim)
+    if problem is not None:
+        raise RuntimeError(
+            f"Collection 'products' {problem}; rebuild it with "
+            "`python -m assistant.utils.fill_db --mode rebuild`"
+        )
+    if not (config.metadata or {}).get("embedding"):
+        logger.warning(
+            "Collection 'products' records no embedding model, so it cannot be "
+            "checked against %r; rebuild it to record one",
+            embedding_id(),
+        )
+    _embedding_checked = True
+
+
+def lexical_confident(points: list[models.ScoredPoint]) -> bool:
+    """The top lexical hit scores high and clearly ahead of the runner-up."""
+    if not points or points[0].score < settings.lexical_fast_path_score:
+        return False
+    return (
+        len(points) == 1
+        or points[0].score >= settings.lexical_fast_path_margin * points[1].score
     )
 
-    products = [x.payload for x in res.points]
 
-    for p in products:
-        p["uuid"] = p.pop("slug")
+def for_model(payload: dict) -> dict:
+    """Copy of a cached payload as returned to the model: no images, slug as uuid."""
+    product = {k: v for k, v in payload.items() if k not in ("slug", "colors")}
+    product["uuid"] = payload.get("slug")
+    product["colors"] = [
+        {k: v for k, v in c.items() if k != "images"}
+        for c in payload.get("colors") or []
+    ]
+    return product
+
+
+async def variants_by_code(codes: list[str]) -> dict[str, tuple[dict, dict]]:
+    """Resolve color codes to ``(product payload, color)``, cache first."""
+    found: dict[str, tuple[dict, dict]] = {}
+    missing = []
+    for code in codes:
+        variant = product_cache.get_variant(code)
+        if variant is None:
+            missing.append(code)
+        else:
+            found[code] = variant
+    if not missing:
+        return found
+
+    # Known codes: one retrieve by point id, picking the color by its index.
+    located: dict = {}
+    for code in missing:
+        loc = code_map.get(code)
+        if loc is not None:
+            located.setdefault(loc[0], []).append((code, loc[1]))
+    if located:
+        records = await qdrant_client().retrieve(
+            collection_name="products",
+            ids=list(located),
+            with_payload=PRODUCT_FIELDS,
+        )
+        for r in records:
+            payload = r.payload or {}
+            product_cache.put(payload)
+            colors = payload.get("colors") or []
+            for code, idx in located.get(r.id, ()):
+                # Guard against a map that is older than the collection.
+                if idx < len(colors) and colors[idx].get("code") == code:
+                    found[code] = (payload, colors[idx])
+
+    unresolved = [c for c in missing if c not in found]
+    if not unresolved:
+        return found
+
+    with QDRANT_QUERY.labels("variants").time():
+        res = await qdrant_client().query_points(
+            collection_name="products",
+            query=None,
+            limit=len(unresolved),
+            query_filter=models.Filter(
+                must=[
+                    models.FieldCondition(
+                        key="colors[].code",
+                        match=models.MatchAny(any=unresolved),
+                    )
+                ]
+            ),
+            with_payload=PRODUCT_FIELDS,
+        )
+    wanted = set(unresolved)
+    for pt in res.points:
+        payload = pt.payload or {}
+        product_cache.put(payload)
+        for c in payload.get("colors") or []:
+            code = c.get("code")
+            if code in wanted and code not in found:
+                found[code] = (payload, c)
+    return found
 
-    return products
+
+async def payloads_by_slug(slugs: list[str]) -> dict[str, dict]:
+    """Resolve slugs to product payloads: cache, then retrieve by point id.
+
+    Point ids are derived from the slug, so a lookup is a key access. Slugs not
+    found that way (collections ingested with other ids) fall back to the
+    keyword index on ``slug``.
+    """
+    found: dict[str, dict] = {}
+    missing = []
+    for slug in dict.fromkeys(s for s in slugs if s):
+        payload = product_cache.get_product(slug)
+        if payload is None:
+            missing.append(slug)
+        else:
+            found[slug] = payload
+    if not missing:
+        return found
+
+    records = await qdrant_client().retrieve(
+        collection_name="products",
+        ids=[product_point_id(s) for s in missing],
+        with_payload=PRODUCT_FIELDS,
+    )
+    for r in records:
+        payload = r.payload or {}
+        product_cache.put(payload)
+        found[payload.get("slug")] = payload
+
+    unresolved = [s for s in missing if s not in found]
+    if not unresolved:
+        return found
+
+    records, _ = await qdrant_client().scroll(
+        collection_name="products",
+        scroll_filter=models.Filter(
+            must=[models.FieldCondition(key="slug", match=MatchAny(any=unresolved))]
+        ),
+        limit=len(unresolved),
+        with_payload=PRODUCT_FIELDS,
+        with_vectors=False,
+    )
+    for r in records:
+        payload = r.payload or {}
+        product_cache.put(payload)
+        found[payload.get("slug")] = payload
+    return found
 
 
 def product_to_card(product: dict, color: dict) -> dict:
@@ -189,39 +489,8 @@ async def display_products(
             }
         )
 
-    res = await client.query_points(
-        collection_name="products",
-        query=None,
-        limit=len(codes),
-        query_filter=models.Filter(
-            must=[
-                models.FieldCondition(
-                    key="colors[].code",
-                    match=models.MatchAny(any=codes),
-                )
-            ]
-        ),
-        with_payload=[
-            "name",
-            "colors[].code",
-            "colors[].url",
-            "colors[].price",
-            "colors[].images",
-        ],
-    )
-
-    wanted = set(codes)
-    code_to_card: dict[str, dict] = {}
-
-    for pt in res.points:
-        payload = pt.payload or {}
-        colors = payload.get("colors") or []
-        for c in colors:
-            code = c.get("code")
-            if code in wanted and code not in code_to_card:
-                code_to_card[code] = product_to_card(payload, c)
-
-    products = [code_to_card[c] for c in codes if c in code_to_card]
+    variants = await variants_by_code(codes)
+    products = [product_to_card(*variants[c]) for c in codes if c in variants]
     if not products:
         return Command(
             update={
@@ -257,33 +526,60 @@ def url_to_openai(url: str) -> dict[str, str]:
 @tool(parse_docstring=True)
 async def get_image(
     code: Annotated[str, "Color code from query_product results (colors[].code field)"],
+    limit: Optional[int] = None,
 ) -> list[dict[str, str]]:
-    """Retrieve product image by color code for visual inspection.
+    """Retrieve the images of a product color variant for visual inspection.
 
     Args:
         code: The color code obtained from the colors[].code field of a previous query_product call. Identifies the specific product color variant.
+        limit: Maximum number of images to return. Returns all images of the variant if not set.
 
     Returns:
-        List containing image object formatted for OpenAI vision API, or empty list if no image found.
+        List of image objects formatted for OpenAI vision API, or empty list if no image found.
     """
     writer = get_stream_writer()
     writer("Inspecting product images...")
 
-    images = await client.query_points(
-        collection_name="products",
-        limit=1,
-        query_filter=models.Filter(
-            must=[
-                models.FieldCondition(
-                    key="colors[].code",
-                    match=models.MatchValue(value=code),
-                ),
-            ]
-        ),
-        with_payload=["colors[].images"],
-    )
-    try:
-        img_url = images.points[0].payload["colors"][0]["images"][0]
-    except IndexError:
+    variant = (await variants_by_code([code])).get(code)
+    if variant is None:
         return []
-    return [url_to_openai(img_url)]
+    images = variant[1].get("images") or []
+    if limit is not None:
+        images = images[: max(limit, 0)]
+    return [url_to_openai(url) for url in images]
+
+
+@tool(parse_docstring=True)
+async def get_images(
+    codes: Annotated[
+        list[str],
+        "Color codes from query_product results (colors[].code field)",
+    ],
+    limit: Optional[int] = None,
+) -> list[dict]:
+    """Retrieve the images of several product color variants in one call.
+
+    Prefer this over several get_image calls when comparing or inspecting more than one variant.
+
+    Args:
+        codes: Color codes obtained from the colors[].code field of previous query_product calls.
+        limit: Maximum number of images per variant. Returns all images of each variant if not set.
+
+    Returns:
+        For each variant found, a text block naming its code followed by its images, formatted for OpenAI vision API.
+    """
+    writer = get_stream_writer()
+    writer("Inspecting product images...")
+
+    codes = list(dict.fromkeys(c for c in codes if c))
+    variants = await variants_by_code(codes)
+    content: list[dict] = []
+    for code in codes:
+        if code not in variants:
+            continue
+        images = variants[code][1].get("images") or []
+        if limit is not None:
+            images = images[: max(limit, 0)]
+        content.append({"type": "text", "text": f"Color code {code}:"})
+        content.extend(url_to_openai(url) for url in images)
+    return content
@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
-from typing import AsyncIterator, Iterable
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterable
 
 from chatkit.server import ChatKitServer, stream_widget
 from chatkit.types import (
@@ -16,18 +17,49 @@ from chatkit.types import (
     ThreadStreamEvent,
     UserMessageItem,
 )
+from langchain_core.messages import AIMessage, HumanMessage
 from langfuse.langchain import CallbackHandler
+from langgraph.graph.state import CompiledStateGraph
 
-from assistant.graphs.db_agent import create_db_agent
+from assistant.api.config import settings
+from assistant.graphs.registry import get_graph
+from assistant.search.qdrant import query_embeddings
 from assistant.ui.widgets import build_products_list
-from assistant.utils.streaming import create_config, stream_graph_updates
+from assistant.utils.streaming import (
+    TextAccumulator,
+    create_config,
+    graph_events,
+)
+from assistant.utils.semantic_cache import SemanticCache
+
+HISTORY_PAGE_SIZE = 100
+HISTORY_TAIL = 10
+
+
+async def replay_events(events: list[tuple[str, Any]]):
+    for event in events:
+        yield event
 
 
 class LangGraphChatKitServer(ChatKitServer[dict]):
-    def __init__(self, store):
-        super().__init__(store)
-        self.graph = create_db_agent()
+    def __init__(self, store, attachment_store=None):
+        super().__init__(store, attachment_store)
         self.langfuse_handler = CallbackHandler()
+        self.semantic_cache = (
+            SemanticCache(
+                query_embeddings(),
+                threshold=settings.semantic_cache_threshold,
+                maxsize=settings.semantic_cache_size,
+                ttl=settings.semantic_cache_ttl,
+                version_path=Path(settings.catalog_version_path),
+            )
+            if settings.semantic_cache_enabled
+            else None
+        )
+
+    @property
+    def graph(self) -> CompiledStateGraph:
+        return get_graph("db_agent")
 
     @staticmethod
     def _extract_text_messages(items: Iterable[object]) -> list[dict[str, str]]:
@@ -50,6 +82,28 @@ class LangGraphChatKitServer(ChatKitServer[dict]):
 
         return messages
 
+    async def _record_replayed_turn(
+        self, config, question: str, events: list[tuple[str, Any]]
+    ) -> None:
+        """Write a cache-served turn into the checkpoint so follow-ups have it."""
+        widgets = [data for kind, data in events if kind == "widget"]
+        answer = "".join(data for kind, data in events if kind == "messages")
+        update: dict[str, Any] = {
+            "messages": [HumanMessage(question), AIMessage(answer)]
+        }
+        if widgets:
+            update["widget"] = widgets[-1]
+        await self.graph.aupdate_state(config, update, as_node="model")
+
+    async def _run_tokens(self, config) -> int:
+        """LLM tokens spent on the thread so far (the whole run, for a first turn)."""
+        state = await self.graph.aget_state(config)
+        return sum(
+            (m.usage_metadata or {}).get("total_tokens", 0)
+            for m in state.values.get("messages", [])
+            if isinstance(m, AIMessage)
+        )
+
     @staticmethod
     def _assistant_start_events(
         thread: ThreadMetadata,
@@ -73,43 +127,100 @@ class LangGraphChatKitServer(ChatKitServer[dict]):
             ),
         ]
 
-    async def respond(
-        self,
-        thread: ThreadMetadata,
-        input_user_message: UserMessageItem | None,
-        context: dict,
-    ) -> AsyncIterator[ThreadStreamEvent]:
-        thread_items_page = await self.store.load_thread_items(
+    async def _load_tail(
+        self, thread: ThreadMetadata, context: dict
+    ) -> list[dict[str, str]]:
+        page = await self.store.load_thread_items(
             thread.id,
             after=None,
-            limit=100,
-            order="asc",
+            limit=HISTORY_TAIL,
+            order="desc",
             context=context,
         )
+        return self._extract_text_messages(reversed(page.data))
 
-        seen_ids = {it.id for it in thread_items_page.data}
-        messages_for_graph = self._extract_text_messages(thread_items_page.data)
+    async def _load_history(
+        self,
+        thread: ThreadMetadata,
+        input_user_message: UserMessageItem | None,
+        context: dict,
+    ) -> list[dict[str, str]]:
+        items = []
+        after = None
+        while True:
+            page = await self.store.load_thread_items(
+                thread.id,
+                after=after,
+                limit=HISTORY_PAGE_SIZE,
+                order="asc",
+                context=context,
+            )
+            items.extend(page.data)
+            if not page.has_more:
+                break
+            after = page.after
 
-        if input_user_message is not None and input_user_message.id not in seen_ids:
-            messages_for_graph.extend(self._extract_text_messages([input_user_message]))
+        if input_user_message is not None and all(
+            it.id != input_user_message.id for it in items
+        ):
+            items.append(input_user_message)
+        return self._extract_text_messages(items)
 
+    async def respond(
+        self,
+        thread: ThreadMetadata,
+        input_user_message: UserMessageItem | None,
+        context: dict,
+    ) -> AsyncIterator[ThreadStreamEvent]:
         assistant_item_id = self.store.generate_item_id("message", thread, context)
 
         config = create_config(
             thread_id=thread.id,
             langfuse_handler=self.langfuse_handler,
+            retrieval_profile=context.get("retrieval_profile"),
         )
-        last = messages_for_graph[-1]["content"] if messages_for_graph else ""
+
+        if await self.graph.checkpointer.aget_tuple(config) is not None:
+            # The checkpoint already holds the conversation; send only the new turn.
+            if input_user_message is not None:
+                new_messages = self._extract_text_messages([input_user_message])
+            else:
+                new_messages = await self._load_tail(thread, context)
+            graph_input = new_messages[-1]["content"] if new_messages else ""
+        else:
+            # No checkpoint (e.g. after a restart): rebuild the history from the store.
+            history = await self._load_history(thread, input_user_message, context)
+            graph_input = history or ""
+
+        # Opening questions do not depend on earlier turns, so they can be
+        # answered from the semantic cache.
+        question = None
+        cached = None
+        recorded: list = []
+        if (
+            self.semantic_cache is not None
+            and isinstance(graph_input, list)
+            and len(graph_input) == 1
+        ):
+            question = graph_input[0]["content"]
+            # The cache adds the filters stated in the question to this scope.
+            scope = context.get("retrieval_profile") or settings.retrieval_profile
+            cached = await self.semantic_cache.lookup(question, scope)
+
+        if cached is not None:
+            events = replay_events(cached)
+        else:
+            events = graph_events(graph_input, self.graph, config)
 
         assistant_started = False
         assistant_created_at: datetime | None = None
-        full_text: list[str] = []
+        full_text = TextAccumulator()
 
-        async for msg_type, delta in stream_graph_updates(
-            last, self.graph, config, custom=True
-        ):
+        async for msg_type, delta in events:
             if not delta:
                 continue
+            if question is not None and msg_type in ("messages", "widget"):
+                recorded.append((msg_type, delta))
 
             if msg_type == "widget":
                 if isinstance(delta, dict) and delta.get("type") == "products_widget":
@@ -163,7 +274,7 @@ class LangGraphChatKitServer(ChatKitServer[dict]):
             ):
                 yield ev
 
-        content = AssistantMessageContent(text="".join(full_text))
+        content = AssistantMessageContent(text=full_text.getvalue())
 
         yield ThreadItemUpdatedEvent(
             item_id=assistant_item_id,
@@ -181,3 +292,10 @@ class LangGraphChatKitServer(ChatKitServer[dict]):
                 content=[content],
             )
         )
+
+        if cached is not None:
+            await self._record_replayed_turn(config, question, recorded)
+        elif question is not None and full_text:
+            await self.semantic_cache.store(
+                question, recorded, await self._run_tokens(config), scope
+            )
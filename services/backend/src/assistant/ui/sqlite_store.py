@@ -0,0 +1,498 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import mmap
+import os
+import re
+import sqlite3
+from pathlib import Path
+from typing import Any, Callable, Dict, Literal, Tuple, TypeVar
+
+from chatkit.store import AttachmentStore, NotFoundError, Store
+from chatkit.types import (
+    Attachment,
+    AttachmentCreateParams,
+    FileAttachment,
+    ImageAttachment,
+    Page,
+    ThreadItem,
+    ThreadMetadata,
+)
+from pydantic import TypeAdapter
+
+from assistant.utils.metrics import STORE_IO, timed
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+_ATTACHMENT_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+_item_adapter: TypeAdapter[ThreadItem] = TypeAdapter(ThreadItem)
+_attachment_adapter: TypeAdapter[Attachment] = TypeAdapter(Attachment)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_created_idx ON threads (created_at, id);
+CREATE TABLE IF NOT EXISTS items (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    UNIQUE (thread_id, id)
+);
+CREATE INDEX IF NOT EXISTS items_thread_seq_idx ON items (thread_id, seq);
+CREATE TABLE IF NOT EXISTS attachments (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+_PendingOp = Tuple[Literal["add", "save"], str]
+
+
+class _ConnectionPool:
+    """Fixed-size pool of SQLite connections used from worker threads."""
+
+    def __init__(self, path: Path, size: int) -> None:
+        self._conns = [self._connect(path) for _ in range(size)]
+        self._idle: asyncio.Queue[sqlite3.Connection] | None = None
+
+    @staticmethod
+    def _connect(path: Path) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            path, check_same_thread=False, timeout=30, isolation_level=None
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 30000")
+        conn.execute("PRAGMA mmap_size = 268435456")
+        return conn
+
+    def execute_script(self, script: str) -> None:
+        self._conns[0].executescript(script)
+
+    async def run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for conn in self._conns:
+                self._idle.put_nowait(conn)
+        conn = await self._idle.get()
+        try:
+            return await asyncio.to_thread(fn, conn)
+        finally:
+            self._idle.put_nowait(conn)
+
+    def close(self) -> None:
+        for conn in self._conns:
+            conn.close()
+
+
+def _transaction(conn: sqlite3.Connection, fn: Callable[[], T]) -> T:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = fn()
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return result
+
+
+class SQLiteStore(Store[dict[str, Any]], AttachmentStore[dict[str, Any]]):
+    """Durable ChatKit store on a SQLite database in WAL mode.
+
+    Several processes can open the same file, so every uvicorn worker serves the
+    same threads. Item writes are buffered for ``flush_interval`` seconds and
+    committed in one transaction, which collapses the many ``save_item`` calls
+    of a streamed response; reads through this store flush first. Buffered
+    writes are only visible to *other* workers once flushed, so a thread read
+    from a second worker may lag by up to ``flush_interval``; set it to 0 to
+    write through. Call ``aclose`` on shutdown to commit the last buffer. A
+    failed flush keeps its writes buffered for the next attempt.
+
+    Attachments use ChatKit's two-phase upload: ``create_attachment`` records
+    the metadata and hands out an upload URL under ``attachments_url``, where
+    the API writes the bytes with ``write_attachment_blob``. Blobs are files in
+    ``attachments_dir`` named by attachment id, read back memory-mapped.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        attachments_dir: str | Path,
+        pool_size: int = 4,
+        flush_interval: float = 0.05,
+        attachments_url: str | None = None,
+    ) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.attachments_dir = Path(attachments_dir)
+        self.attachments_dir.mkdir(parents=True, exist_ok=True)
+        self.attachments_url = attachments_url
+        self.flush_interval = flush_interval
+
+        self._pool = _ConnectionPool(path, pool_size)
+        self._pool.execute_script(_SCHEMA)
+        self._pending: Dict[Tuple[str, str], _PendingOp] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._flush_task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    # -- Write buffering -------------------------------------------------
+    def _enqueue(self, thread_id: str, item: ThreadItem, op: str) -> None:
+        key = (thread_id, item.id)
+        previous = self._pending.get(key)
+        if previous is not None and previous[0] == "add":
+            op = "add"
+        self._pending[key] = (op, item.model_dump_json())  # type: ignore[assignment]
+        if self._flush_handle is None and self.flush_interval > 0:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.flush_interval, self._flush_soon)
+
+    async def _write(self, thread_id: str, item: ThreadItem, op: str) -> None:
+        self._enqueue(thread_id, item, op)
+        if self.flush_interval <= 0:
+            await self.flush()
+
+    def _flush_soon(self) -> None:
+        self._flush_handle = None
+        self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+        self._flush_task.add_done_callback(self._flush_done)
+
+    @staticmethod
+    def _flush_done(task: asyncio.Task) -> None:
+        # Already logged by flush(); retrieve it so it is not reported as lost.
+        if not task.cancelled():
+            task.exception()
+
+    def _restore(self, pending: Dict[Tuple[str, str], _PendingOp]) -> None:
+        """Put a failed batch back ahead of the writes buffered since.
+
+        Adds are committed in buffer order, which gives items their ``seq``, so
+        the older batch must stay first; newer data for the same item wins.
+        """
+        merged = dict(pending)
+        for key, (op, data) in self._pending.items():
+            previous = merged.get(key)
+            if previous is not None and previous[0] == "add":
+                op = "add"
+            merged[key] = (op, data)
+        self._pending = merged
+        if self._flush_handle is None and self.flush_interval > 0:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.flush_interval, self._flush_soon)
+
+    async def flush(self) -> None:
+        """Commit all buffered item writes in a single transaction."""
+        async with self._flush_lock:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+
+            def write(conn: sqlite3.Connection) -> None:
+                def body() -> None:
+                    for (thread_id, item_id), (op, data) in pending.items():
+                        if op == "add":
+                            conn.execute(
+                                "INSERT INTO items (thread_id, id, data) "
+                                "VALUES (?, ?, ?) ON CONFLICT (thread_id, id) "
+                                "DO UPDATE SET data = excluded.data",
+                                (thread_id, item_id, data),
+                            )
+                        else:
+                            conn.execute(
+                                "UPDATE items SET data = ? "
+                                "WHERE thread_id = ? AND id = ?",
+                                (data, thread_id, item_id),
+                            )
+
+                _transaction(conn, body)
+
+            try:
+                await self._pool.run(write)
+            except BaseException as exc:
+                self._restore(pending)
+                if isinstance(exc, Exception):
+                    logger.exception("Flushing %d buffered items failed", len(pending))
+                raise
+
+    # -- Thread metadata -------------------------------------------------
+    @timed(STORE_IO, "sqlite", "load_thread")
+    async def load_thread(
+        self, thread_id: str, context: dict[str, Any]
+    ) -> ThreadMetadata:
+        row = await self._pool.run(
+            lambda conn: conn.execute(
+                "SELECT data FROM threads WHERE id = ?", (thread_id,)
+            ).fetchone()
+        )
+        if row is None:
+            raise NotFoundError(f"Thread {thread_id} not found")
+        return ThreadMetadata.model_validate_json(row[0])
+
+    @timed(STORE_IO, "sqlite", "save_thread")
+    async def save_thread(
+        self, thread: ThreadMetadata, context: dict[str, Any]
+    ) -> None:
+        data = thread.model_dump_json(exclude={"items"})
+        created_at = thread.created_at.timestamp()
+        await self._pool.run(
+            lambda conn: conn.execute(
+                "INSERT INTO threads (id, created_at, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET "
+                "created_at = excluded.created_at, data = excluded.data",
+                (thread.id, created_at, data),
+            )
+        )
+
+    @timed(STORE_IO, "sqlite", "load_threads")
+    async def load_threads(
+        self,
+        limit: int,
+        after: str | None,
+        order: str,
+        context: dict[str, Any],
+    ) -> Page[ThreadMetadata]:
+        cmp, direction = ("<", "DESC") if order == "desc" else (">", "ASC")
+
+        def query(conn: sqlite3.Connection) -> list[tuple[str, str]]:
+            cursor = (
+                conn.execute(
+                    "SELECT created_at, id FROM threads WHERE id = ?", (after,)
+                ).fetchone()
+                if after
+                else None
+            )
+            if cursor is None:
+                return conn.execute(
+                    "SELECT id, data FROM threads "
+                    f"ORDER BY created_at {direction}, id {direction} LIMIT ?",
+                    (limit + 1,),
+                ).fetchall()
+            return conn.execute(
+                "SELECT id, data FROM threads "
+                f"WHERE (created_at, id) {cmp} (?, ?) "
+                f"ORDER BY created_at {direction}, id {direction} LIMIT ?",
+                (*cursor, limit + 1),
+            ).fetchall()
+
+        rows = await self._pool.run(query)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return Page(
+            data=[ThreadMetadata.model_validate_json(data) for _, data in rows],
+            has_more=has_more,
+            after=rows[-1][0] if has_more and rows else None,
+        )
+
+    @timed(STORE_IO, "sqlite", "delete_thread")
+    async def delete_thread(self, thread_id: str, context: dict[str, Any]) -> None:
+        await self.flush()
+
+        def delete(conn: sqlite3.Connection) -> None:
+            def body() -> None:
+                conn.execute("DELETE FROM items WHERE thread_id = ?", (thread_id,))
+                conn.execute("DELETE FROM threads WHERE id = ?", (thread_id,))
+
+            _transaction(conn, body)
+
+        await self._pool.run(delete)
+
+    # -- Thread items ----------------------------------------------------
+    @timed(STORE_IO, "sqlite", "load_thread_items")
+    async def load_thread_items(
+        self,
+        thread_id: str,
+        after: str | None,
+        limit: int,
+        order: str,
+        context: dict[str, Any],
+    ) -> Page[ThreadItem]:
+        await self.flush()
+        cmp, direction = ("<", "DESC") if order == "desc" else (">", "ASC")
+
+        def query(conn: sqlite3.Connection) -> list[tuple[str, str]]:
+            cursor = (
+                conn.execute(
+                    "SELECT seq FROM items WHERE thread_id = ? AND id = ?",
+                    (thread_id, after),
+                ).fetchone()
+                if after
+                else None
+            )
+            if cursor is None:
+                return conn.execute(
+                    "SELECT id, data FROM items WHERE thread_id = ? "
+                    f"ORDER BY seq {direction} LIMIT ?",
+                    (thread_id, limit + 1),
+                ).fetchall()
+            return conn.execute(
+                "SELECT id, data FROM items "
+                f"WHERE thread_id = ? AND seq {cmp} ? "
+                f"ORDER BY seq {direction} LIMIT ?",
+                (thread_id, cursor[0], limit + 1),
+            ).fetchall()
+
+        rows = await self._pool.run(query)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return Page(
+            data=[_item_adapter.validate_json(data) for _, data in rows],
+            has_more=has_more,
+            after=rows[-1][0] if has_more and rows else None,
+        )
+
+    @timed(STORE_IO, "sqlite", "add_thread_item")
+    async def add_thread_item(
+        self, thread_id: str, item: ThreadItem, context: dict[str, Any]
+    ) -> None:
+        await self._write(thread_id, item, "add")
+
+    @timed(STORE_IO, "sqlite", "save_item")
+    async def save_item(
+        self, thread_id: str, item: ThreadItem, context: dict[str, Any]
+    ) -> None:
+        await self._write(thread_id, item, "save")
+
+    @timed(STORE_IO, "sqlite", "load_item")
+    async def load_item(
+        self, thread_id: str, item_id: str, context: dict[str, Any]
+    ) -> ThreadItem:
+        pending = self._pending.get((thread_id, item_id))
+        if pending is not None:
+            return _item_adapter.validate_json(pending[1])
+        row = await self._pool.run(
+            lambda conn: conn.execute(
+                "SELECT data FROM items WHERE thread_id = ? AND id = ?",
+                (thread_id, item_id),
+            ).fetchone()
+        )
+        if row is None:
+            raise NotFoundError(f"Item {item_id} not found")
+        return _item_adapter.validate_json(row[0])
+
+    @timed(STORE_IO, "sqlite", "delete_thread_item")
+    async def delete_thread_item(
+        self, thread_id: str, item_id: str, context: dict[str, Any]
+    ) -> None:
+        await self.flush()
+        await self._pool.run(
+            lambda conn: conn.execute(
+                "DELETE FROM items WHERE thread_id = ? AND id = ?",
+                (thread_id, item_id),
+            )
+        )
+
+    # -- Files -----------------------------------------------------------
+    def _blob_path(self, attachment_id: str) -> Path:
+        if not _ATTACHMENT_ID.fullmatch(attachment_id):
+            raise ValueError(f"Invalid attachment id {attachment_id!r}")
+        return self.attachments_dir / attachment_id
+
+    async def save_attachment(
+        self,
+        attachment: Attachment,
+        context: dict[str, Any],
+    ) -> None:
+        data = attachment.model_dump_json()
+        await self._pool.run(
+            lambda conn: conn.execute(
+                "INSERT INTO attachments (id, data) VALUES (?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET data = excluded.data",
+                (attachment.id, data),
+            )
+        )
+
+    async def load_attachment(
+        self,
+        attachment_id: str,
+        context: dict[str, Any],
+    ) -> Attachment:
+        row = await self._pool.run(
+            lambda conn: conn.execute(
+                "SELECT data FROM attachments WHERE id = ?", (attachment_id,)
+            ).fetchone()
+        )
+        if row is None:
+            raise NotFoundError(f"Attachment {attachment_id} not found")
+        return _attachment_adapter.validate_json(row[0])
+
+    async def delete_attachment(
+        self, attachment_id: str, context: dict[str, Any]
+    ) -> None:
+        path = self._blob_path(attachment_id)
+        await self._pool.run(
+            lambda conn: conn.execute(
+                "DELETE FROM attachments WHERE id = ?", (attachment_id,)
+            )
+        )
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+
+    async def create_attachment(
+        self, input: AttachmentCreateParams, context: dict[str, Any]
+    ) -> Attachment:
+        """Record an attachment whose bytes the client uploads to ``upload_url``."""
+        if self.attachments_url is None:
+            raise NotImplementedError("SQLiteStore needs attachments_url for uploads")
+        attachment_id = self.generate_attachment_id(input.mime_type, context)
+        url = f"{self.attachments_url.rstrip('/')}/{attachment_id}"
+        attachment: Attachment
+        if input.mime_type.startswith("image/"):
+            attachment = ImageAttachment(
+                id=attachment_id,
+                name=input.name,
+                mime_type=input.mime_type,
+                upload_url=url,
+                preview_url=url,
+            )
+        else:
+            attachment = FileAttachment(
+                id=attachment_id,
+                name=input.name,
+                mime_type=input.mime_type,
+                upload_url=url,
+            )
+        await self.save_attachment(attachment, context)
+        return attachment
+
+    async def write_attachment_blob(
+        self, attachment_id: str, data: bytes, context: dict[str, Any]
+    ) -> None:
+        """Store the uploaded bytes of a created attachment (atomically replaced)."""
+        path = self._blob_path(attachment_id)
+        attachment = await self.load_attachment(attachment_id, context)
+
+        def write() -> None:
+            tmp = path.with_name(f".{path.name}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+
+        await asyncio.to_thread(write)
+        if attachment.upload_url is not None:
+            await self.save_attachment(
+                attachment.model_copy(update={"upload_url": None}), context
+            )
+
+    def read_attachment_blob(self, attachment_id: str) -> mmap.mmap | bytes:
+        """Memory-map the attachment bytes; pages are loaded lazily by the OS."""
+        path = self._blob_path(attachment_id)
+        try:
+            with path.open("rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b""
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            raise NotFoundError(f"Attachment {attachment_id} not found") from None
+
+    async def aclose(self) -> None:
+        await self.flush()
+        self._pool.close()
@@ -1,24 +1,47 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
 from datetime import UTC, datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from chatkit.store import NotFoundError, Store
 from chatkit.types import Attachment, Page, Thread, ThreadItem, ThreadMetadata
 
+from assistant.utils.metrics import STORE_IO, timed
+
+_SortKey = Tuple[datetime, str]
+
 
 @dataclass
 class _ThreadState:
     thread: ThreadMetadata
     items: List[ThreadItem]
+    positions: Dict[str, int] = field(default_factory=dict)
+
+
+def _page(data: list, limit: int) -> Page:
+    """Build a page from up to ``limit + 1`` candidates.
+
+    Only the items actually returned are copied.
+    """
+    has_more = len(data) > limit
+    data = [obj.model_copy(deep=True) for obj in data[:limit]]
+    next_after = data[-1].id if has_more and data else None
+    return Page(data=data, has_more=has_more, after=next_after)
 
 
 class MemoryStore(Store[dict[str, Any]]):
-    """Simple in-memory store compatible with the ChatKit server interface."""
+    """Simple in-memory store compatible with the ChatKit server interface.
+
+    Threads are kept in a list sorted by ``(created_at, id)`` and every thread
+    maps item ids to their position, so cursor pagination is a bisect or a dict
+    lookup instead of a full scan. Only the returned page is copied.
+    """
 
     def __init__(self) -> None:
         self._threads: Dict[str, _ThreadState] = {}
+        self._order: List[_SortKey] = []
         # Attachments intentionally unsupported; use a real store that enforces auth.
 
     @staticmethod
@@ -34,28 +57,52 @@ class MemoryStore(Store[dict[str, Any]]):
         data.pop("items", None)
         return ThreadMetadata(**data).model_copy(deep=True)
 
+    @staticmethod
+    def _sort_key(thread: ThreadMetadata) -> _SortKey:
+        return (thread.created_at or datetime.min, thread.id)
+
+    def _index_remove(self, thread: ThreadMetadata) -> None:
+        key = self._sort_key(thread)
+        idx = bisect_left(self._order, key)
+        if idx < len(self._order) and self._order[idx] == key:
+            del self._order[idx]
+
+    def _new_state(self, thread: ThreadMetadata) -> _ThreadState:
+        state = _ThreadState(thread=thread, items=[])
+        self._threads[thread.id] = state
+        key = self._sort_key(thread)
+        # Threads are usually created in time order, so appending is the fast path.
+        if not self._order or self._order[-1] < key:
+            self._order.append(key)
+        else:
+            insort(self._order, key)
+        return state
+
     # -- Thread metadata -------------------------------------------------
+    @timed(STORE_IO, "memory", "load_thread")
     async def load_thread(
         self, thread_id: str, context: dict[str, Any]
     ) -> ThreadMetadata:
         state = self._threads.get(thread_id)
         if not state:
             raise NotFoundError(f"Thread {thread_id} not found")
-        return self._coerce_thread_metadata(state.thread)
+        return state.thread.model_copy(deep=True)
 
+    @timed(STORE_IO, "memory", "save_thread")
     async def save_thread(
         self, thread: ThreadMetadata, context: dict[str, Any]
     ) -> None:
         metadata = self._coerce_thread_metadata(thread)
         state = self._threads.get(thread.id)
-        if state:
-            state.thread = metadata
-        else:
-            self._threads[thread.id] = _ThreadState(
-                thread=metadata,
-                items=[],
-            )
-
+        if state is None:
+            self._new_state(metadata)
+            return
+        if self._sort_key(state.thread) != self._sort_key(metadata):
+            self._index_remove(state.thread)
+            insort(self._order, self._sort_key(metadata))
+        state.thread = metadata
+
+    @timed(STORE_IO, "memory", "load_threads")
     async def load_threads(
         self,
         limit: int,
@@ -63,45 +110,42 @@ class MemoryStore(Store[dict[str, Any]]):
         order: str,
         context: dict[str, Any],
     ) -> Page[ThreadMetadata]:
-        threads = sorted(
-            (
-                self._coerce_thread_metadata(state.thread)
-                for state in self._threads.values()
-            ),
-            key=lambda t: t.created_at or datetime.min,
-            reverse=(order == "desc"),
-        )
+        after_state = self._threads.get(after) if after else None
 
-        if after:
-            index_map = {thread.id: idx for idx, thread in enumerate(threads)}
-            start = index_map.get(after, -1) + 1
+        if order == "desc":
+            end = (
+                bisect_left(self._order, self._sort_key(after_state.thread))
+                if after_state
+                else len(self._order)
+            )
+            keys = self._order[max(end - limit - 1, 0) : end][::-1]
         else:
-            start = 0
-
-        slice_threads = threads[start : start + limit + 1]
-        has_more = len(slice_threads) > limit
-        slice_threads = slice_threads[:limit]
-        next_after = slice_threads[-1].id if has_more and slice_threads else None
-        return Page(
-            data=slice_threads,
-            has_more=has_more,
-            after=next_after,
-        )
+            start = (
+                bisect_right(self._order, self._sort_key(after_state.thread))
+                if after_state
+                else 0
+            )
+            keys = self._order[start : start + limit + 1]
+
+        threads = [self._threads[thread_id].thread for _, thread_id in keys]
+        return _page(threads, limit)
 
+    @timed(STORE_IO, "memory", "delete_thread")
     async def delete_thread(self, thread_id: str, context: dict[str, Any]) -> None:
-        self._threads.pop(thread_id, None)
+        state = self._threads.pop(thread_id, None)
+        if state is not None:
+            self._index_remove(state.thread)
 
     # -- Thread items ----------------------------------------------------
-    def _items(self, thread_id: str) -> List[ThreadItem]:
+    def _state(self, thread_id: str) -> _ThreadState:
         state = self._threads.get(thread_id)
         if state is None:
-            state = _ThreadState(
-                thread=ThreadMetadata(id=thread_id, created_at=datetime.now(UTC)),
-                items=[],
+            state = self._new_state(
+                ThreadMetadata(id=thread_id, created_at=datetime.now(UTC))
             )
-            self._threads[thread_id] = state
-        return state.items
+        return state
 
+    @timed(STORE_IO, "memory", "load_thread_items")
     async def load_thread_items(
         self,
         thread_id: str,
@@ -110,52 +154,69 @@ class MemoryStore(Store[dict[str, Any]]):
         order: str,
         context: dict[str, Any],
     ) -> Page[ThreadItem]:
-        items = [item.model_copy(deep=True) for item in self._items(thread_id)]
-        if order == "desc":
-            items = list(reversed(items))
+        state = self._state(thread_id)
+        items = state.items
+        pos = state.positions.get(after) if after else None
 
-        if after:
-            index_map = {item.id: idx for idx, item in enumerate(items)}
-            start = index_map.get(after, -1) + 1
+        if order == "desc":
+            end = pos if pos is not None else len(items)
+            page_items = items[max(end - limit - 1, 0) : end][::-1]
         else:
-            start = 0
+            start = pos + 1 if pos is not None else 0
+            page_items = items[start : start + limit + 1]
 
-        slice_items = items[start : start + limit + 1]
-        has_more = len(slice_items) > limit
-        slice_items = slice_items[:limit]
-        next_after = slice_items[-1].id if has_more and slice_items else None
-        return Page(data=slice_items, has_more=has_more, after=next_after)
+        return _page(page_items, limit)
 
+    @timed(STORE_IO, "memory", "add_thread_item")
     async def add_thread_item(
         self, thread_id: str, item: ThreadItem, context: dict[str, Any]
     ) -> None:
-        self._items(thread_id).append(item.model_copy(deep=True))
+        state = self._state(thread_id)
+        # Like a plain list append: a repeated id adds another item, and
+        # lookups by id resolve to the first one.
+        state.positions.setdefault(item.id, len(state.items))
+        state.items.append(item.model_copy(deep=True))
 
+    @timed(STORE_IO, "memory", "save_item")
     async def save_item(
         self, thread_id: str, item: ThreadItem, context: dict[str, Any]
     ) -> None:
-        items = self._items(thread_id)
-        for idx, existing in enumerate(items):
-            if existing.id == item.id:
-                items[idx] = item.model_copy(deep=True)
-                return
+        state = self._state(thread_id)
+        pos = state.positions.get(item.id)
+        if pos is not None:
+            state.items[pos] = item.model_copy(deep=True)
 
+    @timed(STORE_IO, "memory", "load_item")
     async def load_item(
         self, thread_id: str, item_id: str, context: dict[str, Any]
     ) -> ThreadItem:
-        for item in self._items(thread_id):
-            if item.id == item_id:
-                return item.model_copy(deep=True)
-        raise NotFoundError(f"Item {item_id} not found")
+        state = self._state(thread_id)
+        pos = state.positions.get(item_id)
+        if pos is None:
+            raise NotFoundError(f"Item {item_id} not found")
+        return state.items[pos].model_copy(deep=True)
 
+    @timed(STORE_IO, "memory", "delete_thread_item")
     async def delete_thread_item(
         self, thread_id: str, item_id: str, context: dict[str, Any]
     ) -> None:
-        items = self._items(thread_id)
-        self._threads[thread_id].items = [item for item in items if item.id != item_id]
+        state = self._state(thread_id)
+        pos = state.positions.pop(item_id, None)
+        if pos is None:
+            return
+        tail = [item for item in state.items[pos + 1 :] if item.id != item_id]
+        del state.items[pos:]
+        moved: set[str] = set()
+        for item in tail:
+            # Re-point ids whose first occurrence was after the deleted item.
+            if state.positions[item.id] > pos and item.id not in moved:
+                state.positions[item.id] = len(state.items)
+                moved.add(item.id)
+            state.items.append(item)
 
     # -- Files -----------------------------------------------------------
-    # These methods are not currently used but required to be compatible with the Store interface.
+    # These methods are not currently used but required to be compatible with
+    # the Store interface.
 
     async def save_attachment(
         self,
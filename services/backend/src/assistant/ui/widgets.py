@@ -14,6 +14,8 @@ from chatkit.widgets import (
     WidgetRoot,
 )
 
+from assistant.utils.metrics import WIDGET_BUILD, timed
+
 
 def build_product_card(
     name: str,
@@ -143,6 +145,7 @@ def build_product_list_item(
     )
 
 
+@timed(WIDGET_BUILD)
 def build_products_list(products: list[dict]) -> WidgetRoot:
     """
     Build a ListView widget containing multiple product cards.
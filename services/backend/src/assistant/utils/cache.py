@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """Bounded LRU cache with per-entry time-to-live and hit/miss counters.
+
+    Not thread-safe; meant to be used from a single event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key, count=False) is not None
+
+    def get(self, key: K, count: bool = True) -> Optional[V]:
+        entry = self._data.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires >= monotonic():
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+            del self._data[key]
+        if count:
+            self.misses += 1
+        return None
+
+    def set(self, key: K, value: V) -> None:
+        expires = monotonic() + self.ttl if self.ttl is not None else float("inf")
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> Optional[V]:
+        entry = self._data.pop(key, None)
+        return entry[1] if entry is not None else None
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
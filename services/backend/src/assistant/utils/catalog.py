@@ -0,0 +1,117 @@
+"""
+Streaming readers and writers for the product catalog.
+
+A catalog is a sequence of ``{"id": ..., "payload": {...}}`` products stored as:
+
+- ``.pickle``: the legacy ``{"points": [...]}`` dump (loaded at once),
+- ``.jsonl``: one product per line, read line by line,
+- ``.parquet``: ``id`` and JSON-encoded ``payload`` columns, memory-mapped and
+  read in record batches (requires ``pyarrow``).
+
+Convert the legacy dump once with::
+
+    python -m assistant.utils.catalog data/data.pickle data/data.jsonl
+"""
+
+import argparse
+import json
+import pickle
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError(
+            "Reading or writing Parquet catalogs requires pyarrow: uv add pyarrow"
+        ) from exc
+    return pa, pq
+
+
+def _iter_pickle(path: Path) -> Iterator[dict]:
+    with open(path, "rb") as f:
+        points = pickle.load(f)["points"]
+    # Drop references as we go so consumed products can be freed.
+    points.reverse()
+    while points:
+        yield points.pop()
+
+
+def _iter_jsonl(path: Path) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_parquet(path: Path, batch_size: int) -> Iterator[dict]:
+    _, pq = _require_pyarrow()
+    parquet = pq.ParquetFile(path, memory_map=True)
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=["id", "payload"]):
+        for row in batch.to_pylist():
+            yield {"id": row["id"], "payload": json.loads(row["payload"])}
+
+
+def iter_products(path: Path, batch_size: int = 1024) -> Iterator[dict]:
+    """Yield products one at a time without holding the whole catalog in memory."""
+    suffix = path.suffix.lower()
+    if suffix == ".jsonl":
+        return _iter_jsonl(path)
+    if suffix == ".parquet":
+        return _iter_parquet(path, batch_size)
+    if suffix == ".pickle":
+        return _iter_pickle(path)
+    raise ValueError(f"Unsupported catalog format: {path}")
+
+
+def chunked(products: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    it = iter(products)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def write_catalog(products: Iterable[dict], path: Path, batch_size: int = 1024) -> int:
+    """Write products to ``.jsonl`` or ``.parquet``, streaming; returns the count."""
+    count = 0
+    if path.suffix.lower() == ".jsonl":
+        with open(path, "w", encoding="utf-8") as f:
+            for product in products:
+                f.write(json.dumps(product, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    if path.suffix.lower() != ".parquet":
+        raise ValueError(f"Unsupported catalog format: {path}")
+    pa, pq = _require_pyarrow()
+    writer = None
+    try:
+        for chunk in chunked(products, batch_size):
+            table = pa.table(
+                {
+                    "id": [p["id"] for p in chunk],
+                    "payload": [
+                        json.dumps(p["payload"], ensure_ascii=False) for p in chunk
+                    ],
+                }
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            count += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a product catalog.")
+    parser.add_argument("source", type=Path)
+    parser.add_argument("target", type=Path)
+    args = parser.parse_args()
+    n = write_catalog(iter_products(args.source), args.target)
+    print(f"wrote {n} products to {args.target}")
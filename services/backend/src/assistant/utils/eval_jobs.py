@@ -0,0 +1,198 @@
+"""
+Background evaluation jobs over Langfuse datasets.
+
+A job runs every dataset item through an async task on the server's own event
+loop, at most ``concurrency`` at a time, so chat traffic keeps being served
+while it runs. Each item is linked to a Langfuse dataset run (as
+``DatasetItemClient.run`` does, but through the async API so the loop never
+blocks on HTTP). Progress is recorded as a list of events that any number of
+SSE subscribers can follow from the start.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from time import perf_counter, time
+from typing import Any, AsyncIterator, Awaitable, Callable, Literal, Optional
+from uuid import uuid4
+
+from langfuse import get_client
+from langfuse.api import CreateDatasetRunItemRequest
+
+logger = logging.getLogger(__name__)
+
+# (output, token usage) of one dataset item.
+ItemTask = Callable[[Any], Awaitable[tuple[Any, dict[str, int]]]]
+
+job_status_t = Literal["pending", "running", "completed", "failed", "cancelled"]
+
+
+@dataclass
+class EvalJob:
+    id: str
+    experiment_name: str
+    dataset_name: str
+    concurrency: int
+    status: job_status_t = "pending"
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    tokens: int = 0
+    latency_total: float = 0.0
+    created_at: float = field(default_factory=time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    events: list[tuple[str, dict]] = field(default_factory=list)
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def publish(self, event: str, data: dict) -> None:
+        self.events.append((event, data))
+        self._changed.set()
+
+    async def follow(self) -> AsyncIterator[tuple[str, dict]]:
+        """All events of the job so far, then new ones until it finishes."""
+        sent = 0
+        while True:
+            while sent < len(self.events):
+                yield self.events[sent]
+                sent += 1
+            if self.finished:
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "experiment_name": self.experiment_name,
+            "dataset_name": self.dataset_name,
+            "status": self.status,
+            "concurrency": self.concurrency,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "tokens": self.tokens,
+            "avg_latency_s": self.latency_total / self.done if self.done else None,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+@asynccontextmanager
+async def dataset_run(langfuse, item, run_name: str):
+    """Async counterpart of ``DatasetItemClient.run``."""
+    trace_name = f"Dataset run: {run_name}"
+    with langfuse.start_as_current_span(name=trace_name) as span:
+        span.update_trace(
+            name=trace_name,
+            metadata={
+                "dataset_item_id": item.id,
+                "run_name": run_name,
+                "dataset_id": item.dataset_id,
+            },
+        )
+        await langfuse.async_api.dataset_run_items.create(
+            request=CreateDatasetRunItemRequest(
+                runName=run_name,
+                datasetItemId=item.id,
+                traceId=span.trace_id,
+            )
+        )
+        yield span
+
+
+class EvalJobs:
+    """Registry of evaluation jobs; keeps the most recent ``keep`` of them."""
+
+    def __init__(self, task: ItemTask, concurrency: int = 4, keep: int = 50) -> None:
+        self.task = task
+        self.concurrency = concurrency
+        self.keep = keep
+        self._jobs: OrderedDict[str, EvalJob] = OrderedDict()
+
+    def get(self, job_id: str) -> Optional[EvalJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list[EvalJob]:
+        return list(self._jobs.values())
+
+    def submit(
+        self,
+        experiment_name: str,
+        dataset_name: str,
+        concurrency: Optional[int] = None,
+    ) -> EvalJob:
+        job = EvalJob(
+            id=uuid4().hex,
+            experiment_name=experiment_name,
+            dataset_name=dataset_name,
+            concurrency=concurrency or self.concurrency,
+        )
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.keep:
+            oldest = next(iter(self._jobs.values()))
+            if not oldest.finished:
+                break
+            self._jobs.popitem(last=False)
+        job._task = asyncio.create_task(self._run(job))
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.finished or job._task is None:
+            return False
+        job._task.cancel()
+        return True
+
+    async def _run_item(self, job: EvalJob, langfuse, item) -> None:
+        start = perf_counter()
+        event: dict[str, Any] = {"item_id": item.id}
+        try:
+            async with dataset_run(langfuse, item, job.experiment_name) as span:
+                output, usage = await self.task(item)
+                span.update_trace(input=item.input, output=output)
+            event["usage"] = usage
+            job.tokens += usage.get("total_tokens", 0)
+        except Exception as exc:
+            logger.exception("Eval job %s: item %s failed", job.id, item.id)
+            job.failed += 1
+            event["error"] = str(exc) or type(exc).__name__
+        latency = perf_counter() - start
+        job.done += 1
+        job.latency_total += latency
+        event.update(latency_s=latency, done=job.done, total=job.total)
+        job.publish("item", event)
+
+    async def _run(self, job: EvalJob) -> None:
+        langfuse = get_client()
+        job.status = "running"
+        try:
+            dataset = await asyncio.to_thread(langfuse.get_dataset, job.dataset_name)
+            job.total = len(dataset.items)
+            job.publish("progress", {"status": job.status, "total": job.total})
+
+            slots = asyncio.Semaphore(job.concurrency)
+
+            async def run(item) -> None:
+                async with slots:
+                    await self._run_item(job, langfuse, item)
+
+            await asyncio.gather(*(run(item) for item in dataset.items))
+            await asyncio.to_thread(langfuse.flush)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as exc:
+            logger.exception("Eval job %s failed", job.id)
+            job.status = "failed"
+            job.error = str(exc) or type(exc).__name__
+        job.finished_at = time()
+        job.publish("error" if job.status == "failed" else "done", job.summary())
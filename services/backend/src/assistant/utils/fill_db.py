@@ -1,66 +1,34 @@
-import pickle
+import argparse
+import asyncio
+import hashlib
+import json
 from pathlib import Path
+from time import perf_counter, time
+from typing import AsyncIterable, AsyncIterator, Iterable, Optional
+from uuid import uuid4
 
-from langchain_ollama import OllamaEmbeddings
-from qdrant_client import QdrantClient, models
+import numpy as np
+from qdrant_client import AsyncQdrantClient, models
 from tqdm import tqdm
 
 from assistant.api.config import settings
-
-with open(Path(__file__).parent.parent.parent / "data" / "data.pickle", "rb") as f:
-    points = pickle.load(f)["points"]
-
-names = [x["payload"]["name"] for x in points]
-descriptions = [x["payload"]["description_plain"] for x in points]
-
-embeddings = OllamaEmbeddings(
-    model="qwen3-embedding:4b",
+from assistant.search import lexical
+from assistant.search.embeddings import (
+    create_embeddings,
+    embedding_metadata,
+    metadata_mismatch,
 )
+from assistant.search.code_map import track_codes, with_point_ids, write_code_map
+from assistant.utils.catalog import chunked, iter_products
+from assistant.utils.semantic_cache import bump_catalog_version
 
-
-def embed_with_progress(emb, texts, desc="embedding"):
-    """Embed texts in large batches and show a fast progress bar."""
-    out = []
-    for doc in tqdm(texts, desc=desc):
-        out.extend(emb.embed_documents(doc))
-    return out
-
-
-names_emb = embed_with_progress(embeddings, names, "embedding names")
-desc_emb = embed_with_progress(embeddings, descriptions, "embedding descriptions")
-
-emb_length = len(desc_emb[0])
-
-column_wise = {
-    "ids": [x["id"] for x in points],
-    "payloads": [x["payload"] for x in points],
-    "vectors": {"name_emb": names_emb, "desc_emb": desc_emb},
-}
-
-client = QdrantClient(
-    host=settings.qdrant_host,
-    port=settings.qdrant_port,
-    api_key=settings.qdrant_api_key.get_secret_value(),
-    grpc_port=settings.qdrant_grpc_port,
-    https=False,
-    prefer_grpc=True,
-)
+DATA_PATH = Path(__file__).parent.parent.parent / "data" / "data.pickle"
+CHECKPOINT_PATH = DATA_PATH.with_name("fill_db.checkpoint")
 
 COLLECTION_NAME = "products"
-
-client.delete_collection(collection_name=COLLECTION_NAME)
-
-client.create_collection(
-    collection_name=COLLECTION_NAME,
-    vectors_config={
-        "name_emb": models.VectorParams(
-            size=emb_length, distance=models.Distance.COSINE
-        ),
-        "desc_emb": models.VectorParams(
-            size=emb_length, distance=models.Distance.COSINE
-        ),
-    },
-)
+# Catalog products compared against stored hashes per Qdrant request in sync.
+SYNC_LOOKUP_SIZE = 1024
+DENSE_VECTORS = ("name_emb", "desc_emb")
 
 FIELD_SCHEMA = [
     ("name", "text"),
@@ -70,16 +38,576 @@ FIELD_SCHEMA = [
     ("colors[].price", "float"),
     ("colors[].color", "keyword"),
     ("colors[].sizes[].size", "keyword"),
+    ("colors[].code", "keyword"),
+    ("slug", "keyword"),
+    ("gender", "keyword"),
 ]
 
-for field, schema in FIELD_SCHEMA:
-    client.create_payload_index(
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def content_hash(payload: dict) -> str:
+    """Hash of the embedded text; a change means the product must be re-embedded."""
+    return _digest(payload["name"], payload["description_plain"])
+
+
+def payload_hash(payload: dict) -> str:
+    data = {k: v for k, v in payload.items() if k not in HASH_FIELDS}
+    return _digest(json.dumps(data, sort_keys=True, ensure_ascii=False))
+
+
+HASH_FIELDS = ("content_hash", "payload_hash")
+
+
+def with_hashes(payload: dict) -> dict:
+    return {
+        **payload,
+        "content_hash": content_hash(payload),
+        "payload_hash": payload_hash(payload),
+    }
+
+
+async def achunked(
+    points: Iterable[dict] | AsyncIterable[dict], size: int
+) -> AsyncIterator[list[dict]]:
+    """``chunked`` for plain and async iterables alike."""
+    if not isinstance(points, AsyncIterable):
+        for chunk in chunked(points, size):
+            yield chunk
+        return
+    chunk: list[dict] = []
+    async for point in points:
+        chunk.append(point)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def append_line(path: Path, entry, mode: str = "a") -> None:
+    with open(path, mode) as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def load_checkpoint(path: Path) -> tuple[Optional[str], set]:
+    """Target collection and ids already upserted by a previous (interrupted) run."""
+    if not path.exists():
+        return None, set()
+    collection, done = None, set()
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if isinstance(entry, dict):
+                collection = entry["collection"]
+            else:
+                done.update(entry)
+    return collection, done
+
+
+async def with_retries(fn, retries: int, what: str):
+    for attempt in range(retries + 1):
+        try:
+            return await fn()
+        except Exception as exc:
+            if attempt == retries:
+                raise
+            delay = 2**attempt
+            tqdm.write(f"{what} failed ({exc!r}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+
+def quantization_config(kind: str):
+    if kind == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=True
+            )
+        )
+    if kind == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    return None
+
+
+def hnsw_config() -> models.HnswConfigDiff:
+    return models.HnswConfigDiff(
+        m=settings.qdrant_hnsw_m, ef_construct=settings.qdrant_hnsw_ef_construct
+    )
+
+
+async def create_collection(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    dim: int,
+    quantization: str = "none",
+    on_disk: bool = False,
+) -> None:
+    await client.delete_collection(collection_name=collection_name)
+    await client.create_collection(
+        collection_name=collection_name,
+        vectors_config={
+            name: models.VectorParams(
+                size=dim, distance=models.Distance.COSINE, on_disk=on_disk
+            )
+            for name in DENSE_VECTORS
+        },
+        sparse_vectors_config={
+            lexical.VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)
+        },
+        hnsw_config=hnsw_config(),
+        quantization_config=quantization_config(quantization),
+        metadata=embedding_metadata(dim),
+    )
+    await create_payload_indexes(client, collection_name)
+
+
+async def update_storage(
+    client: AsyncQdrantClient, collection_name: str, quantization: str, on_disk: bool
+) -> bool:
+    """Apply storage settings that differ from the live collection's.
+
+    Any change makes Qdrant re-optimize the collection in the background, so
+    nothing is sent when the settings already match. Returns whether the
+    collection was updated.
+    """
+    config = (await client.get_collection(collection_name)).config
+    vectors = config.params.vectors or {}
+    vectors_config = {
+        name: models.VectorParamsDiff(on_disk=on_disk)
+        for name in DENSE_VECTORS
+        if name in vectors and bool(vectors[name].on_disk) != on_disk
+    }
+    hnsw = hnsw_config()
+    if (config.hnsw_config.m, config.hnsw_config.ef_construct) == (
+        hnsw.m,
+        hnsw.ef_construct,
+    ):
+        hnsw = None
+    wanted = quantization_config(quantization)
+    quantization_diff = (
+        None
+        if wanted == config.quantization_config
+        else wanted or models.Disabled.DISABLED
+    )
+    if not vectors_config and hnsw is None and quantization_diff is None:
+        return False
+    await client.update_collection(
+        collection_name=collection_name,
+        vectors_config=vectors_config or None,
+        hnsw_config=hnsw,
+        quantization_config=quantization_diff,
+    )
+    return True
+
+
+async def create_payload_indexes(
+    client: AsyncQdrantClient, collection_name: str
+) -> None:
+    """Create the FIELD_SCHEMA indexes; existing indexes are left as they are."""
+    for field, schema in FIELD_SCHEMA:
+        await client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field,
+            field_schema=schema,
+        )
+
+
+def lexical_vectors(batch: list[dict]) -> list[models.SparseVector]:
+    return [lexical.document_vector(lexical.document_text(p["payload"])) for p in batch]
+
+
+async def sync_blocker(
+    client: AsyncQdrantClient, collection_name: str, dim: int
+) -> Optional[str]:
+    """Why the collection cannot be updated in place, or None if it can."""
+    config = (await client.get_collection(collection_name)).config
+    if lexical.VECTOR_NAME not in (config.params.sparse_vectors or {}):
+        return f"has no {lexical.VECTOR_NAME!r} vector"
+    if not (config.metadata or {}).get("embedding"):
+        return "records no embedding model"
+    return metadata_mismatch(config.metadata, config.params.vectors, dim)
+
+
+class Ingestion:
+    """Embeds and upserts points in batches, recording progress for resumption.
+
+    Products are consumed lazily from any (async) iterable. Each batch embeds its names
+    and descriptions in one request into a float32 array, then upserts its
+    points; up to ``concurrency`` batches are embedded and up to
+    ``upsert_parallel`` upserted at the same time, and no more batches than that
+    are held in memory. Ids of upserted batches are
+    appended to ``checkpoint_path`` (if given) so a crashed run continues where
+    it stopped.
+    """
+
+    def __init__(
+        self,
+        client: AsyncQdrantClient,
+        embeddings,
+        collection_name: str,
+        checkpoint_path: Optional[Path] = None,
+        batch_size: int = 64,
+        concurrency: int = 4,
+        upsert_parallel: int = 2,
+        wait: bool = False,
+        retries: int = 3,
+    ) -> None:
+        self.client = client
+        self.embeddings = embeddings
+        self.collection_name = collection_name
+        self.checkpoint_path = checkpoint_path
+        self.batch_size = batch_size
+        self.wait = wait
+        self.retries = retries
+        self._embed_slots = asyncio.Semaphore(concurrency)
+        self._upsert_slots = asyncio.Semaphore(upsert_parallel)
+        # Bounds how many embedded batches can wait in memory for an upsert slot.
+        self._inflight = asyncio.Semaphore(concurrency + upsert_parallel)
+        self._progress: tqdm | None = None
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        async with self._embed_slots:
+            vectors = await with_retries(
+                lambda: self.embeddings.aembed_documents(texts),
+                self.retries,
+                "embedding",
+            )
+        return np.asarray(vectors, dtype=np.float32)
+
+    async def upsert(self, batch: list[dict], vectors: dict) -> None:
+        points = models.Batch(
+            ids=[p["id"] for p in batch],
+            payloads=[with_hashes(p["payload"]) for p in batch],
+            vectors=vectors,
+        )
+        async with self._upsert_slots:
+            await with_retries(
+                lambda: self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=points,
+                    wait=self.wait,
+                ),
+                self.retries,
+                "upsert",
+            )
+
+    async def process(self, batch: list[dict]) -> None:
+        names = [p["payload"]["name"] for p in batch]
+        descriptions = [p["payload"]["description_plain"] for p in batch]
+        embedded = await self.embed(names + descriptions)
+        await self.upsert(
+            batch,
+            {
+                "name_emb": embedded[: len(batch)],
+                "desc_emb": embedded[len(batch) :],
+                lexical.VECTOR_NAME: lexical_vectors(batch),
+            },
+        )
+        if self.checkpoint_path is not None:
+            await asyncio.to_thread(
+                append_line, self.checkpoint_path, [p["id"] for p in batch]
+            )
+        if self._progress is not None:
+            self._progress.update(len(batch))
+
+    async def run(
+        self,
+        points: Iterable[dict] | AsyncIterable[dict],
+        total: Optional[int] = None,
+    ) -> int:
+        count = 0
+        pending: set[asyncio.Task] = set()
+        with tqdm(total=total, desc="ingesting", unit="doc") as progress:
+            self._progress = progress
+            async for batch in achunked(points, self.batch_size):
+                await self._inflight.acquire()
+                for task in [t for t in pending if t.done()]:
+                    pending.discard(task)
+                    task.result()  # surface failures before reading more input
+                task = asyncio.create_task(self.process(batch))
+                task.add_done_callback(lambda _: self._inflight.release())
+                pending.add(task)
+                count += len(batch)
+            await asyncio.gather(*pending)
+        self._progress = None
+        return count
+
+
+async def alias_target(client: AsyncQdrantClient, alias: str) -> Optional[str]:
+    for a in (await client.get_aliases()).aliases:
+        if a.alias_name == alias:
+            return a.collection_name
+    return None
+
+
+async def swap_alias(client: AsyncQdrantClient, alias: str, target: str) -> None:
+    """Atomically point ``alias`` at ``target`` and drop the previous collection."""
+    previous = await alias_target(client, alias)
+    if previous is None and await client.collection_exists(alias):
+        # Legacy layout: a concrete collection owns the name. It has to go before
+        # the alias can be created, so this one-time migration has a short gap.
+        print(f"replacing collection {alias!r} by an alias (one-time migration)")
+        await client.delete_collection(alias)
+    operations: list = []
+    if previous is not None:
+        operations.append(
+            models.DeleteAliasOperation(
+                delete_alias=models.DeleteAlias(alias_name=alias)
+            )
+        )
+    operations.append(
+        models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=target, alias_name=alias)
+        )
+    )
+    await client.update_collection_aliases(change_aliases_operations=operations)
+    if previous is not None and previous != target:
+        await client.delete_collection(previous)
+
+
+async def rebuild(
+    client: AsyncQdrantClient, embeddings, points: Iterable[dict], args
+) -> int:
+    """Build a fresh shadow collection, then swap the alias to it."""
+    if args.restart:
+        args.checkpoint.unlink(missing_ok=True)
+    target, done = await asyncio.to_thread(load_checkpoint, args.checkpoint)
+    if target is None:
+        target = f"{COLLECTION_NAME}_{int(time())}_{uuid4().hex[:6]}"
+        dim = len(await embeddings.aembed_query(COLLECTION_NAME))
+        await create_collection(client, target, dim, args.quantization, args.on_disk)
+        await asyncio.to_thread(
+            append_line, args.checkpoint, {"collection": target}, "w"
+        )
+    todo = (p for p in points if p["id"] not in done)
+    print(f"building {target}: {len(done)} already ingested")
+
+    count = await make_ingestion(client, embeddings, target, args, args.checkpoint).run(
+        todo
+    )
+    await swap_alias(client, COLLECTION_NAME, target)
+    args.checkpoint.unlink(missing_ok=True)
+    return count
+
+
+async def update_payloads(
+    client: AsyncQdrantClient, chunk: list[dict], wait: bool
+) -> None:
+    """Overwrite payloads and lexical vectors of products whose text is unchanged."""
+    await client.batch_update_points(
         collection_name=COLLECTION_NAME,
-        field_name=field,
-        field_schema=schema,
+        update_operations=[
+            models.OverwritePayloadOperation(
+                overwrite_payload=models.SetPayload(
+                    payload=with_hashes(p["payload"]), points=[p["id"]]
+                )
+            )
+            for p in chunk
+        ],
+        wait=wait,
+    )
+    # Color codes are part of the lexical text but not of the content hash.
+    await client.update_vectors(
+        collection_name=COLLECTION_NAME,
+        points=[
+            models.PointVectors(id=p["id"], vector={lexical.VECTOR_NAME: v})
+            for p, v in zip(chunk, lexical_vectors(chunk))
+        ],
+        wait=wait,
     )
 
-client.upsert(
-    collection_name="products",
-    points=models.Batch(**column_wise),
-)
+
+async def changed_points(
+    client: AsyncQdrantClient,
+    points: Iterable[dict],
+    args,
+    seen: set,
+    counts: dict[str, int],
+) -> AsyncIterator[dict]:
+    """Yield new products and products whose text changed.
+
+    The catalog is compared against the stored hashes one lookup chunk at a
+    time; payload-only changes are written as each chunk is scanned. Ids of all
+    catalog products are added to ``seen``.
+    """
+    for lookup in chunked(points, SYNC_LOOKUP_SIZE):
+        records = await client.retrieve(
+            collection_name=COLLECTION_NAME,
+            ids=[p["id"] for p in lookup],
+            with_payload=list(HASH_FIELDS),
+            with_vectors=False,
+        )
+        stored = {r.id: r.payload or {} for r in records}
+        payload_only = []
+        for p in lookup:
+            seen.add(p["id"])
+            hashes = stored.get(p["id"])
+            if hashes is None or hashes.get("content_hash") != content_hash(
+                p["payload"]
+            ):
+                counts["reembed"] += 1
+                yield p
+            elif hashes.get("payload_hash") != payload_hash(p["payload"]):
+                payload_only.append(p)
+        for chunk in chunked(payload_only, args.batch_size):
+            await update_payloads(client, chunk, args.wait)
+        counts["payload_only"] += len(payload_only)
+
+
+async def delete_missing(client: AsyncQdrantClient, seen: set, wait: bool) -> int:
+    """Delete stored points whose ids are not in ``seen``; returns the count."""
+    deleted = 0
+    offset = None
+    while True:
+        records, offset = await client.scroll(
+            collection_name=COLLECTION_NAME,
+            limit=SYNC_LOOKUP_SIZE,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        missing = [r.id for r in records if r.id not in seen]
+        if missing:
+            await client.delete(
+                collection_name=COLLECTION_NAME,
+                points_selector=models.PointIdsList(points=missing),
+                wait=wait,
+            )
+            deleted += len(missing)
+        if offset is None:
+            return deleted
+
+
+async def sync(
+    client: AsyncQdrantClient, embeddings, points: Iterable[dict], args
+) -> int:
+    """Apply catalog changes in place, re-embedding only products whose text changed.
+
+    Changed products stream into the ingestion as the catalog is scanned, so
+    only the ids of the catalog are held for the final deletion pass.
+    """
+    live = await alias_target(client, COLLECTION_NAME) or COLLECTION_NAME
+    await create_payload_indexes(client, live)
+    if await update_storage(client, live, args.quantization, args.on_disk):
+        print(f"updated storage settings of {live!r}; Qdrant re-optimizes it")
+    seen: set = set()
+    counts = {"reembed": 0, "payload_only": 0}
+    await make_ingestion(client, embeddings, COLLECTION_NAME, args, None).run(
+        changed_points(client, points, args, seen, counts)
+    )
+    deleted = await delete_missing(client, seen, args.wait)
+    print(
+        f"sync: {counts['reembed']} new/changed text, "
+        f"{counts['payload_only']} payload-only, {deleted} deleted"
+    )
+    return counts["reembed"] + counts["payload_only"] + deleted
+
+
+def make_ingestion(
+    client: AsyncQdrantClient,
+    embeddings,
+    collection_name: str,
+    args,
+    checkpoint: Optional[Path],
+) -> Ingestion:
+    return Ingestion(
+        client,
+        embeddings,
+        collection_name,
+        checkpoint,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        upsert_parallel=args.upsert_parallel,
+        wait=args.wait,
+        retries=args.retries,
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Embed products into Qdrant.")
+    parser.add_argument(
+        "--mode",
+        choices=["sync", "rebuild"],
+        default="sync",
+        help="sync: apply changes in place (falls back to rebuild if there is no "
+        "collection yet); rebuild: build a shadow collection and swap the alias.",
+    )
+    parser.add_argument(
+        "--data",
+        type=Path,
+        default=DATA_PATH,
+        help="Catalog file (.pickle, .jsonl or .parquet); see assistant.utils.catalog.",
+    )
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_PATH)
+    parser.add_argument(
+        "--code-map",
+        type=Path,
+        default=Path(settings.product_code_map_path),
+        help="Where to write the color code -> point map used by the search tools.",
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=["none", "scalar", "binary"],
+        default=settings.qdrant_quantization,
+        help="Vector quantization; searches rescore with the original vectors.",
+    )
+    parser.add_argument(
+        "--on-disk",
+        action=argparse.BooleanOptionalAction,
+        default=settings.qdrant_vectors_on_disk,
+        help="Keep original vectors on disk (quantized vectors stay in RAM).",
+    )
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--upsert-parallel", type=int, default=2)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument(
+        "--wait", action="store_true", help="Wait for each upsert to be indexed."
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore the rebuild checkpoint and start a new shadow collection.",
+    )
+    args = parser.parse_args()
+
+    embeddings = create_embeddings()
+    client = AsyncQdrantClient(
+        host=settings.qdrant_host,
+        port=settings.qdrant_port,
+        api_key=settings.qdrant_api_key.get_secret_value(),
+        grpc_port=settings.qdrant_grpc_port,
+        https=False,
+        prefer_grpc=True,
+    )
+
+    codes: dict = {}
+    points = track_codes(with_point_ids(iter_products(args.data)), codes)
+    start = perf_counter()
+    live = await alias_target(client, COLLECTION_NAME)
+    can_sync = args.mode == "sync" and not args.checkpoint.exists() and live is not None
+    if can_sync:
+        dim = len(await embeddings.aembed_query(COLLECTION_NAME))
+        if (blocker := await sync_blocker(client, live, dim)) is not None:
+            print(f"{live!r} {blocker}, rebuilding instead")
+            can_sync = False
+    if can_sync:
+        count = await sync(client, embeddings, points, args)
+    else:
+        count = await rebuild(client, embeddings, points, args)
+    write_code_map(args.code_map, codes)
+    bump_catalog_version(Path(settings.catalog_version_path))
+    elapsed = perf_counter() - start
+    print(
+        f"processed {count} docs in {elapsed:.1f}s "
+        f"({count / max(elapsed, 1e-9):.1f} docs/s)"
+    )
+    await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,38 +2,63 @@ from uuid import uuid4
 
 from dotenv import load_dotenv
 from langfuse import get_client
+from langchain_core.messages import AIMessage
 from langfuse.langchain import CallbackHandler
 
-from assistant.graphs.db_agent import create_db_agent
-from assistant.utils.streaming import create_config, stream_graph_updates
+from assistant.api.config import settings
+from assistant.graphs.registry import get_isolated_graph
+from assistant.utils.eval_jobs import EvalJobs
+from assistant.utils.streaming import (
+    TextAccumulator,
+    create_config,
+    stream_graph_updates,
+)
 
 load_dotenv()
 
-agent = create_db_agent()
 
-langfuse = get_client()
+async def my_task(*, item, **kwargs):
+    output, _ = await run_item(item)
+    return output
 
 
-async def my_task(*, item, **kwargs):
+async def run_item(item) -> tuple[str, dict[str, int]]:
+    """Answer one dataset item; returns the response and the LLM token usage."""
+    # Eval threads stay out of the production checkpointer.
+    agent = get_isolated_graph("db_agent")
     question = item.input
     thread_id = str(uuid4())
-    response = ""
+    config = create_config(thread_id, CallbackHandler())
+    response = TextAccumulator()
     async for part in stream_graph_updates(
         user_input=question,
         graph=agent,
-        config=create_config(thread_id, CallbackHandler()),
+        config=config,
     ):
-        response += part
-    return response
+        response.append(part)
+
+    usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    state = await agent.aget_state(config)
+    for message in state.values.get("messages", []):
+        if isinstance(message, AIMessage) and message.usage_metadata:
+            for key in usage:
+                usage[key] += message.usage_metadata.get(key, 0)
+    return response.getvalue(), usage
+
+
+eval_jobs = EvalJobs(
+    run_item, concurrency=settings.eval_concurrency, keep=settings.eval_jobs_keep
+)
 
 
 def run_experiment(experiment_name: str, dataset_name: str):
-    dataset = langfuse.get_dataset(dataset_name)
+    """Blocking run through langfuse's experiment runner, for scripts and notebooks."""
+    dataset = get_client().get_dataset(dataset_name)
 
     result = dataset.run_experiment(
         name=experiment_name,
         task=my_task,  # type: ignore
-        max_concurrency=10,
+        max_concurrency=settings.eval_concurrency,
     )
 
     return result.format()
@@ -0,0 +1,217 @@
+"""
+In-process latency histograms exposed in the Prometheus text format.
+
+Observing a value is a bisect and two additions, so timers can stay on hot
+paths. Histograms are per process (per worker under ``api.serve``); the
+``/metrics`` endpoint renders them together with gauge snapshots of the
+existing stats (stream coalescing, caches) registered with ``add_gauges``.
+"""
+
+import inspect
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Iterator, Optional
+
+# Seconds; covers cached lookups up to slow LLM calls.
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0, 30.0, 60.0,
+)  # fmt: skip
+FAST_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)  # fmt: skip
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Timer:
+    __slots__ = ("series", "start")
+
+    def __init__(self, series: "Series") -> None:
+        self.series = series
+
+    def __enter__(self) -> "_Timer":
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.series.observe(perf_counter() - self.start)
+
+
+class Series:
+    """One label combination of a histogram."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: dict[tuple[str, ...], Series] = {}
+
+    def labels(self, *values: str) -> Series:
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            series = self._series[values] = Series(self.buckets)
+        return series
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                le = _labels(self.labelnames, values, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            le = _labels(self.labelnames, values, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {series.count}"
+            labels = _labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {series.sum}"
+            yield f"{self.name}_count{labels} {series.count}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._histograms: dict[str, Histogram] = {}
+        self._gauges: list[tuple[str, str, Callable[[], Optional[dict]]]] = []
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = Histogram(
+                name, help, labelnames, buckets
+            )
+        return histogram
+
+    def add_gauges(
+        self, prefix: str, help: str, collect: Callable[[], Optional[dict]]
+    ) -> None:
+        """Expose every numeric value of ``collect()`` as ``<prefix>_<key>``.
+
+        ``collect`` may return None when there is nothing to report yet.
+        """
+        self._gauges.append((prefix, help, collect))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for histogram in self._histograms.values():
+            lines.extend(histogram.render())
+        for prefix, help, collect in self._gauges:
+            for key, value in (collect() or {}).items():
+                if isinstance(value, (int, float)):
+                    name = f"{prefix}_{key}"
+                    lines += [
+                        f"# HELP {name} {help}",
+                        f"# TYPE {name} gauge",
+                        f"{name} {value}",
+                    ]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def timed(histogram: Histogram, *labels: str):
+    """Decorator observing the duration of each call (awaited, for coroutines)."""
+    series = histogram.labels(*labels)
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    series.observe(perf_counter() - start)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                series.observe(perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+TTFT = registry.histogram(
+    "assistant_ttft_seconds",
+    "Time from the start of a graph run to its first streamed text delta.",
+)
+LLM_CALL = registry.histogram(
+    "assistant_llm_call_seconds",
+    "Duration of chat model calls.",
+    ("model",),
+)
+EMBEDDING = registry.histogram(
+    "assistant_embedding_seconds",
+    "Query embedding latency in product search (including cache hits).",
+)
+QDRANT_QUERY = registry.histogram(
+    "assistant_qdrant_query_seconds",
+    "Duration of Qdrant query_points calls.",
+    ("stage",),
+)
+WIDGET_BUILD = registry.histogram(
+    "assistant_widget_build_seconds",
+    "Time to build the products list widget.",
+    buckets=FAST_BUCKETS,
+)
+STORE_IO = registry.histogram(
+    "assistant_store_seconds",
+    "Duration of ChatKit store operations.",
+    ("store", "op"),
+    buckets=FAST_BUCKETS,
+)
@@ -0,0 +1,198 @@
+"""
+Semantic cache of complete agent answers to opening questions.
+
+Near-identical first messages ("waterproof men's hiking boots under 3000")
+are answered by replaying the stored stream of text and widgets instead of
+running the agent again. Messages are embedded with the (cached) query
+embeddings and matched by cosine similarity in a small in-memory numpy index,
+within a scope: the request options that change the answer, plus the
+filters stated in the message itself (genders, product groups and prices, see
+``filter_scope``), since "boots under 3000" and "boots under 5000" embed almost
+identically.
+
+Entries expire after ``ttl`` seconds, and the whole cache is dropped whenever
+``fill_db`` bumps the catalog version file, since prices and stock in a cached
+answer may be stale after a sync.
+"""
+
+import os
+import re
+from pathlib import Path
+from time import monotonic
+from typing import Any, Optional
+from uuid import uuid4
+
+import numpy as np
+
+from assistant.search.lexical import tokenize
+
+Event = tuple[str, Any]
+
+# Token prefixes (casefolded, without diacritics) naming a gender or a product
+# group, in Czech and English; inflected forms share the prefix.
+FILTER_TERMS: dict[str, tuple[str, ...]] = {
+    "gender:men": ("pansk", "muz", "men", "man", "male"),
+    "gender:women": ("damsk", "zen", "women", "woman", "female", "lady", "ladies"),
+    "gender:kids": ("detsk", "deti", "kid", "child", "boy", "girl", "junior"),
+    "gender:uni": ("uni",),
+    "group:boots": ("bot", "obuv", "shoe", "boot"),
+    "group:clothing": ("obleceni", "cloth"),
+    "group:glasses": ("bryl", "glasses", "goggle"),
+    "group:accessories": ("doplnk", "accessor"),
+    "group:gear": ("vystroj", "gear", "equipment"),
+}
+# Words before a number that make it an upper or a lower price bound.
+UPPER_BOUND = {"under", "below", "less", "max", "maximum", "to", "do", "pod"}
+LOWER_BOUND = {"over", "above", "more", "min", "minimum", "from", "od", "nad"}
+_THOUSANDS = re.compile(r"(?<=\d)[ .,](?=\d{3}\b)")
+
+
+def bump_catalog_version(path: Path) -> None:
+    """Mark the catalog as changed; called by ``fill_db`` after every run."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(uuid4().hex)
+    os.replace(tmp, path)
+
+
+def compact_events(events: list[Event]) -> list[Event]:
+    """Merge consecutive text deltas so a replay is a handful of events."""
+    out: list[Event] = []
+    run: list[str] = []
+    for kind, data in events:
+        if kind == "messages":
+            run.append(data)
+            continue
+        if run:
+            out.append(("messages", "".join(run)))
+            run = []
+        out.append((kind, data))
+    if run:
+        out.append(("messages", "".join(run)))
+    return out
+
+
+def filter_scope(text: str) -> str:
+    """Filters stated in ``text``, as a canonical string.
+
+    Messages that differ in gender, product group or price never share an
+    answer, however close their embeddings are. Matching is deliberately
+    loose: a spurious term only costs a cache miss.
+    """
+    tokens = tokenize(_THOUSANDS.sub("", text))
+    terms = {
+        term
+        for token in tokens
+        for term, prefixes in FILTER_TERMS.items()
+        if token.startswith(prefixes)
+    }
+    for i, token in enumerate(tokens):
+        if token.isdigit():
+            before = tokens[i - 1] if i else ""
+            if before == "than" and i > 1:  # "less than 3000"
+                before = tokens[i - 2]
+            bound = (
+                "<" if before in UPPER_BOUND else ">" if before in LOWER_BOUND else ""
+            )
+            terms.add(f"{bound}{int(token)}")
+    return ",".join(sorted(terms))
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        embeddings,
+        threshold: float = 0.95,
+        maxsize: int = 1000,
+        ttl: float = 3600.0,
+        version_path: Optional[Path] = None,
+    ) -> None:
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_path = version_path
+        self.lookups = 0
+        self.hits = 0
+        self.tokens_saved = 0
+        self._version: Optional[int] = None
+        self._vectors: Optional[np.ndarray] = None
+        # Parallel to the rows of _vectors: (expires, scope, events, tokens).
+        self._entries: list[tuple[float, str, list[Event], int]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._vectors = None
+        self._entries = []
+
+    def _check_version(self) -> None:
+        if self.version_path is None:
+            return
+        try:
+            version = self.version_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            version = None
+        if version != self._version:
+            self._version = version
+            self.clear()
+
+    def _drop(self, keep: np.ndarray) -> None:
+        self._entries = [e for e, k in zip(self._entries, keep) if k]
+        self._vectors = self._vectors[keep] if self._entries else None
+
+    async def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(await self.embeddings.aembed_query(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    async def lookup(self, text: str, scope: str = "") -> Optional[list[Event]]:
+        """Return the stored events of the closest cached question, if close enough."""
+        self.lookups += 1
+        scope = f"{scope}|{filter_scope(text)}"
+        self._check_version()
+        if not self._entries:
+            return None
+        query = await self._embed(text)
+        now = monotonic()
+        scores = self._vectors @ query
+        for idx, (expires, entry_scope, _, _) in enumerate(self._entries):
+            if expires < now or entry_scope != scope:
+                scores[idx] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        _, _, events, tokens = self._entries[best]
+        self.hits += 1
+        self.tokens_saved += tokens
+        return events
+
+    async def store(
+        self, text: str, events: list[Event], tokens: int = 0, scope: str = ""
+    ) -> None:
+        self._check_version()
+        scope = f"{scope}|{filter_scope(text)}"
+        vector = await self._embed(text)
+        now = monotonic()
+        if self._entries:
+            keep = np.array([e[0] >= now for e in self._entries])
+            if len(self._entries) >= self.maxsize:
+                keep[: len(self._entries) - self.maxsize + 1] = False
+            if not keep.all():
+                self._drop(keep)
+        entry = (now + self.ttl, scope, compact_events(events), tokens)
+        self._entries.append(entry)
+        self._vectors = (
+            vector[None, :]
+            if self._vectors is None
+            else np.vstack([self._vectors, vector])
+        )
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "size": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "tokens_saved": self.tokens_saved,
+        }
@@ -0,0 +1,86 @@
+"""
+Server-sent events framing for ``graph_events`` streams.
+
+Each graph event becomes one SSE message with an event type and a JSON
+``data`` line::
+
+    event: text
+    data: "Hello"
+
+    event: progress
+    data: "Searching for products..."
+
+    event: widget
+    data: {"type": "products_widget", "products": [...]}
+
+A stream ends with ``event: done`` (or ``event: error`` if the graph failed).
+When the client disconnects the graph run is cancelled, so an abandoned
+request stops consuming LLM tokens.
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import suppress
+from typing import Any, AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+SSE_EVENTS = {"messages": "text", "custom": "progress", "widget": "widget"}
+
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def sse_stream(
+    events: AsyncIterator[tuple[str, Any]],
+    request: Request,
+    poll_interval: float = DISCONNECT_POLL_INTERVAL,
+) -> AsyncIterator[str]:
+    """Frame ``(kind, data)`` events as SSE, cancelling them if the client leaves.
+
+    The next event is awaited in a task so the connection can be checked even
+    while the graph is busy (e.g. waiting for a tool or the first token).
+    """
+    pending = asyncio.ensure_future(anext(events))
+    try:
+        while True:
+            done, _ = await asyncio.wait({pending}, timeout=poll_interval)
+            if not done:
+                if await request.is_disconnected():
+                    return
+                continue
+            try:
+                kind, data = pending.result()
+            except StopAsyncIteration:
+                break
+            except Exception as exc:
+                logger.exception("Graph stream failed")
+                yield format_sse("error", {"message": str(exc) or type(exc).__name__})
+                return
+            pending = asyncio.ensure_future(anext(events))
+            event = SSE_EVENTS.get(kind)
+            if event is not None and data:
+                yield format_sse(event, data)
+        yield format_sse("done", {})
+    finally:
+        pending.cancel()
+        with suppress(BaseException):
+            await pending
+        await events.aclose()
+
+
+def sse_response(
+    events: AsyncIterator[tuple[str, Any]], request: Request
+) -> StreamingResponse:
+    return StreamingResponse(
+        sse_stream(events, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
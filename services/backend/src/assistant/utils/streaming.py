@@ -1,21 +1,114 @@
+import asyncio
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, AsyncIterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.messages import HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import MessagesState
 from langgraph.graph.state import CompiledStateGraph
 
+from assistant.api.config import settings
+from assistant.utils.metrics import LLM_CALL, TTFT
+
+
+def normalize_delta(c: str | list) -> str:
+    if isinstance(c, str):
+        return c
+    if len(c) == 1:
+        # Streamed chunks almost always carry a single content block.
+        b = c[0]
+        return b.get("text", "") if isinstance(b, dict) else ""
+    return "".join([b.get("text", "") for b in c if isinstance(b, dict)])
+
+
+class TextAccumulator:
+    """Collects streamed text chunks and joins them once, in O(n).
+
+    Accepts plain strings and content-block lists. The running length and the
+    number of non-empty deltas are tracked without building the string.
+    """
+
+    __slots__ = ("_parts", "_length", "_tokens")
+
+    def __init__(self) -> None:
+        self._parts: list[str] = []
+        self._length = 0
+        self._tokens = 0
+
+    def append(self, chunk: str | list) -> str:
+        text = chunk if chunk.__class__ is str else normalize_delta(chunk)
+        if text:
+            self._parts.append(text)
+            self._length += len(text)
+            self._tokens += 1
+        return text
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    @property
+    def token_count(self) -> int:
+        return self._tokens
+
+    def getvalue(self) -> str:
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def take(self) -> str:
+        """Return the accumulated text and reset the buffer."""
+        text = self.getvalue()
+        self._parts = []
+        self._length = 0
+        self._tokens = 0
+        return text
 
-def normalize_delta(c: list) -> str:
-    out = ""
-    for b in c:
-        if isinstance(b, dict):
-            out += b.get("text", "")
-    return out
 
+class LLMTimingCallback(BaseCallbackHandler):
+    """Records the duration of every chat model call in ``LLM_CALL``."""
 
-def create_config(thread_id: str, langfuse_handler) -> RunnableConfig:
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._started: dict[UUID, tuple[float, str]] = {}
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs
+    ) -> None:
+        model = (metadata or {}).get("ls_model_name", "unknown")
+        self._started[run_id] = (perf_counter(), model)
+
+    def _finish(self, run_id: UUID) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            start, model = started
+            LLM_CALL.labels(model).observe(perf_counter() - start)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs) -> None:
+        self._finish(run_id)
+
+
+llm_timing = LLMTimingCallback()
+
+
+def create_config(
+    thread_id: str, langfuse_handler, retrieval_profile: Optional[str] = None
+) -> RunnableConfig:
+    configurable = {"thread_id": thread_id}
+    if retrieval_profile is not None:
+        configurable["retrieval_profile"] = retrieval_profile
     return RunnableConfig(
-        configurable={"thread_id": thread_id},
-        callbacks=[langfuse_handler],
+        configurable=configurable,
+        callbacks=[langfuse_handler, llm_timing],
         metadata={
             "langfuse_session_id": thread_id,
         },
@@ -23,14 +116,20 @@ def create_config(thread_id: str, langfuse_handler) -> RunnableConfig:
 
 
 async def stream_graph_updates(
-    user_input: str,
+    user_input: str | list[dict[str, str]],
     graph: CompiledStateGraph,
     config,
     node_name: str = "model",
     custom: bool = False,
 ):
-    chat_input = [HumanMessage(content=user_input)]
+    # A string is a single new user turn; a list replays a whole history.
+    chat_input = (
+        [HumanMessage(content=user_input)]
+        if isinstance(user_input, str)
+        else user_input
+    )
     stream_modes = ["messages"] + (["updates", "custom"] if custom else [])
+    start: Optional[float] = perf_counter()
 
     async for mode, payload in graph.astream(
         MessagesState(messages=chat_input),  # type: ignore
@@ -42,6 +141,9 @@ async def stream_graph_updates(
             if metadata.get("langgraph_node") != node_name:
                 continue
             content = normalize_delta(getattr(chunk, "content", []))
+            if start is not None and content:
+                TTFT.observe(perf_counter() - start)
+                start = None
             yield (mode, content) if custom else content
         elif mode == "updates":
             if isinstance(payload, dict):
@@ -52,3 +154,148 @@ async def stream_graph_updates(
                             yield ("widget", widget)
         elif custom:
             yield mode, payload
+
+
+@dataclass
+class CoalesceStats:
+    """Counters describing how much delta coalescing reduced stream events."""
+
+    responses: int = 0
+    deltas_in: int = 0
+    events_out: int = 0
+    added_ttft_total: float = 0.0
+    added_latency_max: float = 0.0
+
+    def snapshot(self) -> dict[str, float]:
+        responses = self.responses or 1
+        return {
+            "responses": self.responses,
+            "deltas_per_response": self.deltas_in / responses,
+            "events_per_response": self.events_out / responses,
+            "reduction": self.deltas_in / self.events_out if self.events_out else 1.0,
+            "added_ttft_ms": self.added_ttft_total / responses * 1000,
+            "added_latency_max_ms": self.added_latency_max * 1000,
+        }
+
+
+coalesce_stats = CoalesceStats()
+
+
+def _text_of(event: Any) -> Optional[str]:
+    if isinstance(event, str):
+        return event
+    if isinstance(event, tuple) and len(event) == 2 and event[0] == "messages":
+        return event[1] if isinstance(event[1], str) else None
+    return None
+
+
+async def coalesce_deltas(
+    events: AsyncIterator[Any],
+    window_ms: Optional[float] = None,
+    max_chars: Optional[int] = None,
+    stats: CoalesceStats = coalesce_stats,
+) -> AsyncIterator[Any]:
+    """Merge text deltas from ``stream_graph_updates`` into fewer, larger events.
+
+    The first text delta is forwarded immediately so time-to-first-token is not
+    delayed. Later deltas are buffered until ``window_ms`` has passed since the
+    oldest buffered delta or ``max_chars`` characters are buffered. Non-text
+    events (progress, widgets) flush the buffer and pass through in order.
+    Works on both plain string deltas and ``("messages", text)`` tuples.
+    """
+    window = (settings.stream_coalesce_ms if window_ms is None else window_ms) / 1000
+    max_chars = settings.stream_coalesce_chars if max_chars is None else max_chars
+    if window <= 0 and max_chars <= 0:
+        async for event in events:
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[tuple[float, Any]] = asyncio.Queue()
+    done = object()
+
+    async def pump() -> None:
+        try:
+            async for event in events:
+                queue.put_nowait((loop.time(), event))
+        finally:
+            queue.put_nowait((loop.time(), done))
+
+    pump_task = asyncio.create_task(pump())
+    buf = TextAccumulator()
+    tagged = False
+    deadline: Optional[float] = None
+    oldest: Optional[float] = None
+    first_text = True
+    stats.responses += 1
+
+    def flush() -> Any:
+        nonlocal deadline, oldest
+        text = buf.take()
+        if oldest is not None:
+            stats.added_latency_max = max(stats.added_latency_max, loop.time() - oldest)
+        deadline, oldest = None, None
+        stats.events_out += 1
+        return ("messages", text) if tagged else text
+
+    try:
+        while True:
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                received, event = await asyncio.wait_for(queue.get(), timeout)
+            except TimeoutError:
+                yield flush()
+                continue
+
+            if event is done:
+                if not pump_task.cancelled():
+                    pump_task.result()  # re-raise a failure of the source stream
+                break
+
+            text = _text_of(event)
+            if text is None:
+                if buf:
+                    yield flush()
+                yield event
+                continue
+            if not text:
+                continue
+
+            stats.deltas_in += 1
+            tagged = isinstance(event, tuple)
+            if first_text:
+                first_text = False
+                stats.events_out += 1
+                stats.added_ttft_total += loop.time() - received
+                yield event
+                continue
+
+            if oldest is None:
+                oldest = received
+                deadline = received + window
+            buf.append(text)
+            if max_chars > 0 and len(buf) >= max_chars:
+                yield flush()
+
+        if buf:
+            yield flush()
+    finally:
+        # Wait for the cancellation to reach the graph run before returning.
+        pump_task.cancel()
+        await asyncio.wait({pump_task})
+
+
+def graph_events(
+    user_input: str | list[dict[str, str]],
+    graph: CompiledStateGraph,
+    config,
+    node_name: str = "model",
+) -> AsyncIterator[tuple[str, Any]]:
+    """The event stream shared by all endpoints: coalesced ``(kind, data)`` tuples.
+
+    ``kind`` is ``"messages"`` for text deltas, ``"custom"`` for progress
+    messages and ``"widget"`` for widget payloads.
+    """
+    return coalesce_deltas(
+        stream_graph_updates(user_input, graph, config, node_name, custom=True)
+    )